@@ -1,15 +1,24 @@
 import streamlit as st
-import tempfile
 import os
+import uuid
 from dotenv import load_dotenv
 
-from loaders.document_loader import load_pdf
-from processing.text_splitter import split_documents
+from loaders.document_loader import iter_pdf_pages, temporary_pdf
+from processing.ingest_pipeline import ingest
 from embeddings.embedding_model import get_embeddings
-from vectorstore.chroma_store import create_vectorstore
-from chains.conversational_chain import build_chain
-from tools.web_search import search_web
-from langchain_core.messages import HumanMessage, AIMessage
+from vectorstore.index_registry import IndexRegistry, file_hash
+from vectorstore.resource_pool import ResourcePool
+from vectorstore.corpus_index import CorpusIndex
+from chains.conversational_chain import build_chain, build_retriever, build_summarizer
+from chains.answer_cache import SemanticAnswerCache, is_follow_up, replay
+from retrievers.answerability import ANSWERABILITY_GATE
+from tools.web_search import answer_not_found, prefetch_web, search_web
+from memory.chat_memory import RollingHistory
+from memory.conversation_store import HISTORY_PAGE, ConversationStore
+from providers.registry import KEY_NAMES, PROVIDERS
+from providers.hedging import HEDGE_ENABLED
+from ui.stream_renderer import StreamRenderer
+from monitoring.tracing import LLMTracingHandler, tracer
 
 load_dotenv()
 
@@ -219,27 +228,48 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
-# ─── Provider Config ─────────────────────────────────────────────────────────
-PROVIDERS = {
-    "OpenAI": {
-        "icon": "🟢",
-        "models": ["gpt-4o-mini", "gpt-4o", "gpt-4.1-mini", "gpt-4.1-nano"],
-        "key_name": "OPENAI_API_KEY",
-        "id": "openai",
-    },
-    "Google Gemini": {
-        "icon": "🔵",
-        "models": ["gemini-2.0-flash", "gemini-2.5-flash", "gemini-2.5-pro"],
-        "key_name": "GOOGLE_API_KEY",
-        "id": "google",
-    },
-    "Anthropic": {
-        "icon": "🟠",
-        "models": ["claude-sonnet-4-20250514", "claude-3-5-haiku-20241022"],
-        "key_name": "ANTHROPIC_API_KEY",
-        "id": "anthropic",
-    },
-}
+# ─── Shared Resources ────────────────────────────────────────────────────────
+@st.cache_resource
+def get_index_registry():
+    """One on-disk index registry per server process, shared by all sessions."""
+    return IndexRegistry()
+
+
+@st.cache_resource
+def get_resource_pool():
+    """Corpora shared by every session that has the same documents open."""
+    return ResourcePool()
+
+
+@st.cache_resource
+def get_answer_cache():
+    """Semantic answer cache shared by all sessions of this server process."""
+    return SemanticAnswerCache()
+
+
+@st.cache_resource
+def get_conversation_store():
+    """On-disk conversations of every user, shared by all sessions."""
+    return ConversationStore()
+
+
+def upload_hashes(uploaded_files):
+    """SHA-256 of each upload by ``file_id``, hashed once per upload rather than on every rerun."""
+    known = st.session_state.get("upload_hashes", {})
+    st.session_state.upload_hashes = {
+        f.file_id: known.get(f.file_id) or file_hash(f) for f in uploaded_files
+    }
+    return st.session_state.upload_hashes
+
+
+def current_user():
+    """Signed-in user's email, else an id kept in the page URL so a reload resumes the chat."""
+    email = st.user.get("email")
+    if email:
+        return email
+    if "user" not in st.query_params:
+        st.query_params["user"] = uuid.uuid4().hex
+    return st.query_params["user"]
 
 
 # ─── Session State Init ─────────────────────────────────────────────────────
@@ -247,6 +277,10 @@ if "messages" not in st.session_state:
     st.session_state.messages = []
 if "doc_info" not in st.session_state:
     st.session_state.doc_info = None
+if "history" not in st.session_state:
+    st.session_state.history = RollingHistory()
+if "history_shown" not in st.session_state:
+    st.session_state.history_shown = HISTORY_PAGE
 
 
 # ─── Sidebar ─────────────────────────────────────────────────────────────────
@@ -294,30 +328,17 @@ with st.sidebar:
     st.markdown('<div class="sidebar-divider"></div>', unsafe_allow_html=True)
 
     # ── Document Upload
-    st.markdown("### 📄 Document")
-    uploaded_file = st.file_uploader(
+    st.markdown("### 📄 Documents")
+    uploaded_files = st.file_uploader(
         "Upload PDF",
         type=["pdf"],
+        accept_multiple_files=True,
         label_visibility="collapsed",
-        help="Upload a PDF to start chatting about its content",
+        help="Upload one or more PDFs to start chatting about their content",
     )
 
-    # Show doc info if available
-    if st.session_state.doc_info:
-        info = st.session_state.doc_info
-        st.markdown(f"""
-        <div class="doc-stats">
-            <div class="stat-card">
-                <div class="stat-value">{info['pages']}</div>
-                <div class="stat-label">Pages</div>
-            </div>
-            <div class="stat-card">
-                <div class="stat-value">{info['chunks']}</div>
-                <div class="stat-label">Chunks</div>
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
-        st.caption(f"📎 {info['filename']}")
+    # Filled in once the documents are processed
+    doc_panel = st.container()
 
     st.markdown('<div class="sidebar-divider"></div>', unsafe_allow_html=True)
 
@@ -325,25 +346,47 @@ with st.sidebar:
     st.markdown("### ⚙️ Options")
     web_search_enabled = st.toggle("🌐 Web Search Fallback", value=False,
                                     help="Search the web if answer isn't in the document")
+    hedge_enabled = st.toggle("⚡ Hedge Slow Providers", value=HEDGE_ENABLED,
+                              help="Also ask another configured provider when the first token is slow")
+    # Only this session's stages are timed; the panel and the export show the
+    # spans of every session that has tracing on
+    tracing_enabled = st.toggle("⏱️ Latency Tracing", value=tracer.enabled,
+                                help="Time each retrieval, embedding and LLM stage")
+    tracer.use(tracing_enabled)
+    if tracing_enabled:
+        with st.expander("⏱️ Latency (ms)"):
+            latency = tracer.stats()
+            if latency:
+                st.dataframe(
+                    [{"stage": name, **values} for name, values in latency.items()],
+                    hide_index=True, use_container_width=True,
+                )
+            else:
+                st.caption("No spans recorded yet.")
 
     st.markdown('<div class="sidebar-divider"></div>', unsafe_allow_html=True)
 
     # ── Actions
     if st.button("🗑️ Clear Chat", use_container_width=True):
-        st.session_state.messages = []
+        # Also deletes the saved conversation about these documents
+        st.session_state.messages.clear()
+        st.session_state.history.reset()
         st.rerun()
 
     if st.button("🔄 Reset Document", use_container_width=True):
-        for key in ["chain", "vectorstore", "doc_info", "last_file"]:
+        if "corpus_lease" in st.session_state:
+            st.session_state.pop("corpus_lease").release()
+        for key in ["chain", "chain_key", "retriever", "doc_info", "conversation_key"]:
             st.session_state.pop(key, None)
         st.session_state.messages = []
+        st.session_state.history.reset()
         st.rerun()
 
 
 # ─── Main Chat Area ──────────────────────────────────────────────────────────
 
 # Welcome state
-if not uploaded_file and not st.session_state.messages:
+if not uploaded_files and not st.session_state.messages:
     st.markdown("""
     <div class="welcome-card">
         <div class="icon">📚</div>
@@ -365,80 +408,191 @@ if not uploaded_file and not st.session_state.messages:
 
 
 # ─── Document Processing ────────────────────────────────────────────────────
-if uploaded_file:
+# Documents closed in the uploader give their shared corpus back to the pool
+if not uploaded_files and "corpus_lease" in st.session_state:
+    st.session_state.pop("corpus_lease").release()
+
+if uploaded_files:
     if not api_key:
         st.warning(f"⚠️ Please enter your **{provider_cfg['key_name']}** in the sidebar to continue.")
         st.stop()
 
-    # Process document if new file or provider/model changed
-    needs_rebuild = (
-        "chain" not in st.session_state
-        or st.session_state.get("last_file") != uploaded_file.name
-        or st.session_state.get("last_provider") != provider_cfg["id"]
-        or st.session_state.get("last_model") != selected_model
-    )
-
-    if needs_rebuild:
-        with st.status("🔄 Processing document...", expanded=True) as status:
+    embed_provider = provider_cfg["embeddings"]
+    embed_key = api_key
+    # Providers without embeddings (Anthropic) need the embedding provider's key from the
+    # environment; without one, documents are embedded locally instead
+    if embed_provider != provider_cfg["id"]:
+        embed_key = os.getenv(KEY_NAMES[embed_provider], "")
+        if not embed_key:
+            embed_provider = "local"
+            st.caption(f"🖥️ No {KEY_NAMES[provider_cfg['embeddings']]} set — documents are embedded locally.")
+
+    embeddings = get_embeddings(provider=embed_provider, api_key=embed_key)
+    registry = get_index_registry()
+    hashes = upload_hashes(uploaded_files)
+    uploads = {hashes[f.file_id]: f for f in uploaded_files}
+
+    # Retrieval only depends on the documents and the embedding model, so the
+    # corpus is kept across chat model changes; only the chain is rebuilt.
+    # Sessions with the same documents share one pooled corpus; a session
+    # whose uploads change moves its lease to the corpus for the new set.
+    corpus_key = (embeddings.model_id, tuple(sorted(uploads)))
+    lease = st.session_state.get("corpus_lease")
+    if lease is None or lease.key != corpus_key:
+        pool = get_resource_pool()
+        to_build = [doc_id for doc_id in uploads if not registry.exists(doc_id, embeddings.model_id)]
+        with st.status("🔄 Processing documents...", expanded=bool(to_build)) as status:
             try:
-                # Save uploaded file
-                st.write("📥 Loading PDF...")
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-                    tmp.write(uploaded_file.read())
-                    file_path = tmp.name
-
-                # Load & split
-                documents = load_pdf(file_path)
-                st.write(f"📄 Loaded {len(documents)} pages")
-
-                st.write("✂️ Splitting into chunks...")
-                chunks = split_documents(documents)
-                st.write(f"🧩 Created {len(chunks)} chunks")
-
-                # Embeddings & vectorstore
-                st.write("🧮 Creating embeddings...")
-                embed_provider = "google" if provider_cfg["id"] == "google" else "openai"
-                embed_key = api_key if provider_cfg["id"] == "google" else api_key
-                # For Anthropic, we need OpenAI embeddings key — use env fallback
-                if provider_cfg["id"] == "anthropic":
-                    embed_key = os.getenv("OPENAI_API_KEY", api_key)
-
-                embeddings = get_embeddings(provider=embed_provider, api_key=embed_key)
-                vectorstore = create_vectorstore(chunks, embeddings)
-                st.session_state.vectorstore = vectorstore
-
-                # Build chain
-                st.write(f"🤖 Connecting to {selected_provider}...")
-                chain = build_chain(
-                    vectorstore,
-                    provider=provider_cfg["id"],
-                    model=selected_model,
-                    api_key=api_key,
-                )
-                st.session_state.chain = chain
-
-                # Save state
-                st.session_state.last_file = uploaded_file.name
-                st.session_state.last_provider = provider_cfg["id"]
-                st.session_state.last_model = selected_model
-                st.session_state.doc_info = {
-                    "filename": uploaded_file.name,
-                    "pages": len(documents),
-                    "chunks": len(chunks),
-                }
-
-                # Clean up temp file
-                os.unlink(file_path)
-
-                status.update(label="✅ Document ready!", state="complete")
+                def build_index(uploaded_file):
+                    st.write(f"📥 Loading {uploaded_file.name}...")
+                    progress = st.empty()
+
+                    def show_progress(stats):
+                        progress.markdown(
+                            f"📄 {stats['pages']} pages · 🧩 {stats['chunks']} chunks · "
+                            f"🧮 {stats['embedded']} embedded · 📚 {stats['indexed']} indexed"
+                        )
+
+                    # Spool the upload to disk in blocks (deleted afterwards, even on
+                    # failure), then load, split, embed and index as overlapping stages
+                    with temporary_pdf(uploaded_file) as file_path:
+                        with tracer.trace("build_index", document=uploaded_file.name):
+                            vectorstore, stats = ingest(
+                                iter_pdf_pages(file_path), embeddings, on_progress=show_progress
+                            )
+
+                    return vectorstore, {
+                        "pages": stats["pages"],
+                        "chunks": stats["chunks"],
+                        "duplicates": stats["duplicates"],
+                    }
+
+                def build_corpus():
+                    corpus = CorpusIndex(embeddings)
+                    for doc_id, uploaded_file in uploads.items():
+                        if registry.exists(doc_id, embeddings.model_id):
+                            st.write(f"⚡ Loading saved index for {uploaded_file.name}...")
+                        vectorstore, info = registry.get_or_create(
+                            doc_id, embeddings.model_id, embeddings,
+                            lambda: build_index(uploaded_file),
+                        )
+                        corpus.add_document(doc_id, vectorstore, name=uploaded_file.name, info=info)
+                    return corpus
+
+                st.session_state.corpus_lease = pool.acquire(corpus_key, build_corpus)
+                if lease is not None:
+                    lease.release()
+                status.update(label="✅ Documents ready!", state="complete", expanded=False)
 
             except Exception as e:
                 status.update(label="❌ Processing failed", state="error")
                 st.error(f"**Error:** {str(e)}")
                 st.stop()
 
+    # Shared with other sessions: read-only from here on
+    corpus = st.session_state.corpus_lease.value
+    totals = corpus.totals()
+    st.session_state.doc_info = {
+        "filenames": [entry["name"] for entry in corpus.documents.values()],
+        "pages": totals.get("pages", 0),
+        "chunks": totals.get("chunks", 0),
+    }
+
+    # ─── Document Panel ──────────────────────────────────────────────────────
+    selected_doc_ids = None
+    with doc_panel:
+        info = st.session_state.doc_info
+        st.markdown(f"""
+        <div class="doc-stats">
+            <div class="stat-card">
+                <div class="stat-value">{info['pages']}</div>
+                <div class="stat-label">Pages</div>
+            </div>
+            <div class="stat-card">
+                <div class="stat-value">{info['chunks']}</div>
+                <div class="stat-label">Chunks</div>
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+
+        # Optionally restrict retrieval to some of the documents
+        if len(corpus) > 1:
+            names = {doc_id: entry["name"] for doc_id, entry in corpus.documents.items()}
+            selected = st.multiselect(
+                "🔎 Search in",
+                list(names),
+                default=list(names),
+                format_func=names.get,
+            )
+            if selected and len(selected) < len(corpus):
+                selected_doc_ids = selected
+        else:
+            st.caption(f"📎 {info['filenames'][0]}")
+
+    # Rebuild the chain when the chat model, the corpus or the filter changes
+    chain_key = (
+        provider_cfg["id"],
+        selected_model,
+        corpus_key,
+        embed_key,
+        tuple(selected_doc_ids) if selected_doc_ids else None,
+        hedge_enabled,
+    )
+    if st.session_state.get("chain_key") != chain_key:
+        try:
+            # Queries are embedded with this session's own client and key
+            vectorstore = corpus.vectorstore_for(embeddings)
+            st.session_state.retriever = build_retriever(
+                vectorstore,
+                doc_ids=selected_doc_ids,
+                bm25=corpus.bm25,
+            )
+            st.session_state.chain = build_chain(
+                vectorstore,
+                provider=provider_cfg["id"],
+                model=selected_model,
+                api_key=api_key,
+                retriever=st.session_state.retriever,
+                hedge=hedge_enabled,
+                gate=corpus.answerability(embeddings) if ANSWERABILITY_GATE else None,
+            )
+            st.session_state.summarizer = build_summarizer(
+                provider=provider_cfg["id"],
+                model=selected_model,
+                api_key=api_key,
+            )
+            st.session_state.history.provider = provider_cfg["id"]
+            st.session_state.chain_key = chain_key
+        except Exception as e:
+            st.error(f"**Error:** {str(e)}")
+            st.stop()
+
+    # Resume this user's saved conversation about these documents, newest
+    # messages only; older ones are read if the history is paged back
+    conversation_key = (current_user(), tuple(sorted(uploads)))
+    if st.session_state.get("conversation_key") != conversation_key:
+        conversation = get_conversation_store().open(*conversation_key)
+        st.session_state.messages = conversation
+        st.session_state.history.summary = conversation.summary
+        st.session_state.history.summarized = conversation.summarized
+        st.session_state.history_shown = HISTORY_PAGE
+        st.session_state.conversation_key = conversation_key
+
+    # Answers can be shared by anyone asking about the same documents and model
+    answer_scope = (
+        tuple(sorted(selected_doc_ids or corpus.doc_ids)),
+        provider_cfg["id"],
+        selected_model,
+    )
+
     # ─── Chat History Display ────────────────────────────────────────────────
-    for msg in st.session_state.messages:
+    # Only the newest page is rendered on each rerun
+    messages = st.session_state.messages
+    hidden = len(messages) - st.session_state.history_shown
+    if hidden > 0 and st.button(f"⬆️ Show earlier messages ({hidden})"):
+        st.session_state.history_shown += HISTORY_PAGE
+        st.rerun()
+    for msg in messages[max(0, hidden):]:
         with st.chat_message(msg["role"], avatar="🧑‍💻" if msg["role"] == "user" else "🧠"):
             st.markdown(msg["content"])
             if msg.get("web_results"):
@@ -452,38 +606,75 @@ if uploaded_file:
             st.markdown(question)
         st.session_state.messages.append({"role": "user", "content": question})
 
-        # Build chat history for the chain
-        chat_history = []
-        for msg in st.session_state.messages[:-1]:  # exclude current question
-            if msg["role"] == "user":
-                chat_history.append(HumanMessage(content=msg["content"]))
-            else:
-                chat_history.append(AIMessage(content=msg["content"]))
+        # Recent turns that fit the history budget, plus a summary of older ones
+        history = st.session_state.history
+        messages = st.session_state.messages
+        history_summary, chat_history = history.window(messages, end=len(messages) - 1)  # exclude current question
 
         # Generate response
-        with st.chat_message("assistant", avatar="🧠"):
+        with st.chat_message("assistant", avatar="🧠"), \
+                tracer.trace("question", provider=provider_cfg["id"], model=selected_model) as question_span:
             try:
-                response_placeholder = st.empty()
-                full_response = ""
-
-                # Stream the response
-                for chunk in st.session_state.chain.stream({
-                    "question": question,
-                    "chat_history": chat_history,
-                }):
-                    full_response += chunk
-                    response_placeholder.markdown(full_response + "▌")
-
-                response_placeholder.markdown(full_response)
+                renderer = StreamRenderer(st.empty().markdown)
+
+                # Repeated questions about the same documents are replayed from
+                # the shared answer cache, unless they lean on the chat history.
+                # An exact repeat is found without embedding anything; otherwise
+                # the cache compares the vector retrieval embedded the question
+                # with (lexical-only matches are never embedded)
+                answer_cache = get_answer_cache()
+                retriever = st.session_state.retriever
+                cacheable = not (chat_history and is_follow_up(question))
+                cached_answer = answer_cache.get(answer_scope, question) if cacheable else None
+                if cached_answer is None:
+                    # Retrieve up front so weak matches can start the web search
+                    # while the answer is still being generated
+                    docs = retriever.invoke(question)
+                    if cacheable:
+                        cached_answer, _ = answer_cache.lookup(
+                            answer_scope, question, embed=lambda: retriever.query_vector(question)
+                        )
+
+                question_span["cache_hit"] = cached_answer is not None
+                web_future = None
+                answerable = True
+                if cached_answer is not None:
+                    stream = replay(cached_answer)
+                else:
+                    gate = corpus.answerability(embeddings)
+                    if ANSWERABILITY_GATE:
+                        # The chain answers these without calling the LLM
+                        answerable = gate.answerable(question, docs)
+                        question_span["answerable"] = answerable
+                    # Weak means below the relevance threshold calibrated for this
+                    # corpus and embedding model; raw scores aren't comparable across them
+                    if web_search_enabled and (not answerable or gate.weak(docs)):
+                        web_future = prefetch_web(question)
+
+                    llm_handler = LLMTracingHandler(provider_cfg["id"], selected_model)
+                    stream = st.session_state.chain.stream({
+                        "question": question,
+                        "chat_history": chat_history,
+                        "history_summary": history_summary,
+                        "docs": docs,
+                    }, config={"callbacks": [llm_handler]})
+
+                # Stream the response, coalescing tokens into frames
+                full_response = renderer.consume(stream)
+                question_span["frames"] = renderer.frames
+                if cached_answer is None:
+                    # Input tokens the provider served from its prompt cache
+                    question_span["cache_read_tokens"] = llm_handler.usage.get("cache_read", 0)
+
+                if cacheable and cached_answer is None and answerable:
+                    answer_cache.store(answer_scope, question, full_response, retriever.query_vector(question))
 
                 # Web search fallback
                 web_results = None
-                if web_search_enabled and any(
-                    phrase in full_response.lower()
-                    for phrase in ["not in the context", "not mentioned", "i don't have", "no information", "cannot find"]
-                ):
+                if web_search_enabled and (not answerable or answer_not_found(full_response)):
                     with st.spinner("🌐 Searching the web..."):
-                        web_results = search_web(question)
+                        # Usually already finished by the speculative search
+                        web_results = web_future.result() if web_future else search_web(question)
                     if web_results:
                         with st.expander("🌐 Web Search Results", expanded=True):
                             st.markdown(web_results)
@@ -494,6 +685,11 @@ if uploaded_file:
                     "web_results": web_results,
                 })
 
+                # Fold turns that no longer fit into the rolling summary now,
+                # after the answer is shown, rather than before the next one
+                history.compact(st.session_state.messages, st.session_state.summarizer)
+                st.session_state.messages.save_summary(history.summary, history.summarized)
+
             except Exception as e:
                 error_msg = str(e)
                 if "api_key" in error_msg.lower() or "auth" in error_msg.lower():
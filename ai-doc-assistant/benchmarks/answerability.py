@@ -0,0 +1,149 @@
+"""Answerability gate: how often it refuses, and what refusing saves.
+
+Run from the ai-doc-assistant directory::
+
+    python -m benchmarks.answerability --pages 100 --first-token 0.8
+
+Ingests a generated PDF into a ``CorpusIndex`` (``--embeddings`` fake or
+hashing, both offline), calibrates its ``AnswerabilityGate`` and asks:
+
+- "on_topic": questions worded from the document's vocabulary, but never
+  copied from it,
+- "document_level": summary and overview questions about the document as a
+  whole, which share no specific words with it,
+- "off_topic": general questions, none of them in ``OFF_TOPIC_PROBES``.
+
+Reports the share of each the gate refuses (refusing on-topic or
+document-level questions is the error that matters), and the time to a complete answer through
+``build_chain`` with and without the gate, with a fake chat model that
+takes ``--first-token`` seconds to start and ``--token-delay`` per word.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from benchmarks.pdf_generator import make_pdf, page_lines
+from chains.conversational_chain import build_chain, build_retriever
+from chains.fake_llm import FakeStreamingChatModel
+from embeddings.fake_embeddings import FakeEmbeddings
+from embeddings.local_embeddings import HashingEmbeddings
+from loaders.document_loader import iter_pdf_pages
+from processing.ingest_pipeline import IngestPipeline
+from vectorstore.corpus_index import CorpusIndex
+
+
+OFF_TOPIC = [
+    "Who is the current president of France?",
+    "How many calories are in a banana?",
+    "What's a good name for a golden retriever puppy?",
+    "Translate 'good morning' into Spanish.",
+    "When did the Roman Empire fall?",
+    "How do I change a flat bicycle tire?",
+    "What is the plot of Hamlet?",
+    "Which planet has the most moons?",
+    "Suggest a weekend trip from Berlin.",
+    "How do you make cold brew coffee?",
+    "What is the speed of light?",
+    "Who wrote Pride and Prejudice?",
+    "What are the rules of chess castling?",
+    "Give me a vegan lasagna recipe.",
+    "How long do cats usually live?",
+    "What is the tallest building in the world?",
+    "How do I learn to juggle?",
+    "What causes the northern lights?",
+    "Which team won the NBA finals in 2016?",
+    "How do I write a cover letter?",
+]
+
+DOCUMENT_LEVEL = [
+    "What are the main points?",
+    "Give me an overview of the key topics covered.",
+    "Summarize this document.",
+    "What is this document about?",
+    "What are the key takeaways?",
+    "Can you give me a brief summary of the main ideas?",
+    "List the most important points in the file.",
+    "What topics does the PDF cover?",
+    "Outline the sections of the document.",
+    "Tell me what the uploaded text describes.",
+]
+
+TEMPLATES = [
+    "What does the document say about {} and {}?",
+    "How is the {} {} handled?",
+    "Is there a {} for {}?",
+    "Explain the {} requirements for {}.",
+    "When is the {} {} due?",
+]
+
+
+def on_topic_questions(pages, count, seed=0):
+    rng = random.Random(seed)
+    vocabulary = sorted({
+        word for page in range(min(pages, 20)) for line in page_lines(page)[1:]
+        for word in line.split()[1:] if word.isalpha()
+    })
+    return [rng.choice(TEMPLATES).format(*rng.sample(vocabulary, 2)) for _ in range(count)]
+
+
+def _answer_seconds(chain, questions):
+    times = []
+    for question in questions:
+        start = time.perf_counter()
+        chain.invoke({"question": question, "chat_history": []})
+        times.append(time.perf_counter() - start)
+    return round(statistics.median(times) * 1000, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--embeddings", choices=["fake", "hashing"], default="hashing")
+    parser.add_argument("--first-token", type=float, default=0.8)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    args = parser.parse_args()
+
+    embeddings = FakeEmbeddings() if args.embeddings == "fake" else HashingEmbeddings(workers=1)
+    with tempfile.TemporaryDirectory() as workdir:
+        path = make_pdf(os.path.join(workdir, "gate.pdf"), args.pages, boilerplate=True)
+        vectorstore, _ = IngestPipeline(embeddings).run(iter_pdf_pages(path))
+    corpus = CorpusIndex(embeddings)
+    corpus.add_document("doc", vectorstore, name="gate.pdf")
+
+    start = time.perf_counter()
+    gate = corpus.answerability(embeddings)
+    calibration_ms = round((time.perf_counter() - start) * 1000, 1)
+
+    retriever = build_retriever(corpus.vectorstore, bm25=corpus.bm25)
+    questions = {
+        "on_topic": on_topic_questions(args.pages, args.questions),
+        "document_level": DOCUMENT_LEVEL,
+        "off_topic": OFF_TOPIC,
+    }
+    results = {"settings": vars(args), "threshold": gate.threshold, "calibration_ms": calibration_ms}
+    for kind, asked in questions.items():
+        verdicts = [gate.check(q, retriever.invoke(q)) for q in asked]
+        results[kind] = {
+            "questions": len(asked),
+            "refused": round(sum(not v["answerable"] for v in verdicts) / len(asked), 3),
+            "relevance_p50": round(statistics.median(v["relevance"] or 0.0 for v in verdicts), 3),
+            "coverage_p50": round(statistics.median(v["coverage"] for v in verdicts), 3),
+        }
+
+    llm = FakeStreamingChatModel(first_token_delay=args.first_token, token_delay=args.token_delay)
+    ungated = build_chain(corpus.vectorstore, provider="fake", retriever=retriever, llm=llm)
+    gated = build_chain(corpus.vectorstore, provider="fake", retriever=retriever, llm=llm, gate=gate)
+    for kind, asked in questions.items():
+        sample = asked[:10]
+        results[kind]["answer_ms_ungated"] = _answer_seconds(ungated, sample)
+        results[kind]["answer_ms_gated"] = _answer_seconds(gated, sample)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
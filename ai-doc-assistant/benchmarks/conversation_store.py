@@ -0,0 +1,99 @@
+"""Resuming a saved conversation: cost against conversation length.
+
+Run from the ai-doc-assistant directory::
+
+    python -m benchmarks.conversation_store --turns 10 100 1000 10000
+
+For each length, saves a conversation in a fresh ``ConversationStore``
+(summarized as the app would leave it), then times:
+
+- "resume": opening it and building the next question's history window
+  with the same call the app makes (the pending question excluded with
+  ``end``), what a reloaded session does before it can answer, plus the
+  messages that left in memory ("resume_rows"),
+- "resume_full": the same after reading every message, as keeping the
+  whole list would need,
+- "turn": the per-question work of a running session (window, append,
+  compact) with the message objects already built,
+- "page_back": loading one more page of older messages for display.
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from memory.chat_memory import RollingHistory
+from memory.conversation_store import HISTORY_PAGE, ConversationStore
+
+
+ANSWER = " ".join(["The document covers this on the cited page, with the figures given there."] * 10)
+
+
+def _summarize(summary, messages):
+    words = (summary + " " + " ".join(m["content"] for m in messages)).split()
+    return " ".join(words[-120:])
+
+
+def _timed(func, repeat=20):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return round(statistics.median(times) * 1000, 3)
+
+
+def bench(store, turns):
+    user, docs = f"user-{turns}", ["doc-a", "doc-b"]
+    conversation = store.open(user, docs)
+    history = RollingHistory()
+    for i in range(turns):
+        conversation.append({"role": "user", "content": f"Question {i} about the document?"})
+        conversation.append({"role": "assistant", "content": ANSWER})
+        history.compact(conversation, _summarize)
+        conversation.save_summary(history.summary, history.summarized)
+
+    def resume(full=False):
+        resumed = store.open(user, docs)
+        if full:
+            resumed[0]
+        restored = RollingHistory()
+        restored.summary, restored.summarized = resumed.summary, resumed.summarized
+        # The last saved message stands in for the question being asked
+        restored.window(resumed, end=len(resumed) - 1)
+        return resumed
+
+    def page_back():
+        resumed = store.open(user, docs)
+        resumed.recent(2 * HISTORY_PAGE)
+
+    def turn():
+        conversation.append({"role": "user", "content": "One more question?"})
+        history.window(conversation, end=len(conversation) - 1)
+        history.compact(conversation, _summarize)
+
+    return {
+        "turns": turns,
+        "resume_ms": _timed(resume),
+        "resume_rows": len(resume()._messages),
+        "resume_full_ms": _timed(lambda: resume(full=True), repeat=5),
+        "turn_ms": _timed(turn),
+        "page_back_ms": _timed(page_back),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        store = ConversationStore(os.path.join(workdir, "conversations.sqlite3"))
+        for turns in args.turns:
+            print(json.dumps(bench(store, turns)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Ingest throughput with a remote embedding API vs the local CPU backends.
+
+Run from the ai-doc-assistant directory::
+
+    python -m benchmarks.embedding_backends --pages 500 --latency 0.3
+
+Ingests the same generated PDF through ``IngestPipeline`` with:
+
+- "remote": OpenAI embeddings against ``embeddings.fake_embedding_server``
+  with ``--latency`` seconds per request, through the batch scheduler,
+- "hashing_1_worker" and "hashing": the dependency-free local backend on
+  one process and on every core,
+- "sentence_transformers": ``--model`` on CPU, if sentence-transformers is
+  installed,
+
+and reports chunks per second plus how often dense retrieval finds the
+page line a question was taken from.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from langchain_openai import OpenAIEmbeddings
+
+from benchmarks.pdf_generator import make_pdf
+from benchmarks.run_benchmarks import _queries
+from chains.conversational_chain import build_retriever
+from embeddings.embedding_scheduler import ScheduledEmbeddings
+from embeddings.fake_embedding_server import make_app, serve_in_thread
+from embeddings.local_embeddings import HashingEmbeddings, SentenceTransformerEmbeddings
+from loaders.document_loader import iter_pdf_pages
+from processing.ingest_pipeline import IngestPipeline
+
+
+def run_ingest(path, embeddings, pages, queries):
+    pipeline = IngestPipeline(embeddings)
+    start = time.perf_counter()
+    vectorstore, stats = pipeline.run(iter_pdf_pages(path))
+    elapsed = time.perf_counter() - start
+    retriever = build_retriever(vectorstore, mmr=False)
+    questions = _queries(pages, queries)
+    hits = sum(any(q in doc.page_content for doc in retriever.invoke(q)) for q in questions)
+    return {
+        "seconds": round(elapsed, 3),
+        "chunks": stats["chunks"],
+        "chunks_per_s": round(stats["chunks"] / elapsed, 1),
+        "embed_seconds": round(pipeline.busy["embed"], 3),
+        "hit_rate": round(hits / len(questions), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.3, help="remote seconds per request")
+    parser.add_argument("--concurrency", type=int, default=4, help="remote requests in flight")
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    args = parser.parse_args()
+
+    results = {"settings": vars(args), "cpus": os.cpu_count()}
+    with tempfile.TemporaryDirectory() as workdir:
+        path = make_pdf(os.path.join(workdir, "backends.pdf"), args.pages, boilerplate=True)
+
+        app = make_app(latency=args.latency)
+        server, base_url = serve_in_thread(app)
+        remote = ScheduledEmbeddings(
+            OpenAIEmbeddings(model="fake-256", base_url=base_url, api_key="fake",
+                             check_embedding_ctx_length=False, max_retries=0),
+            max_concurrency=args.concurrency,
+        )
+        results["remote"] = {**run_ingest(path, remote, args.pages, args.queries),
+                             "requests": app.state.stats["served"]}
+        server.should_exit = True
+
+        results["hashing_1_worker"] = run_ingest(path, HashingEmbeddings(workers=1), args.pages, args.queries)
+        results["hashing"] = run_ingest(path, HashingEmbeddings(), args.pages, args.queries)
+        try:
+            local = SentenceTransformerEmbeddings(args.model)
+        except ImportError as e:
+            results["sentence_transformers"] = {"skipped": str(e)}
+        else:
+            results["sentence_transformers"] = run_ingest(path, local, args.pages, args.queries)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Embedding throughput against a throttling server: serial batches vs the scheduler.
+
+Run from the ai-doc-assistant directory::
+
+    python -m benchmarks.embedding_throttling --chunks 2000 --rps 8 --latency 0.25
+
+Starts ``embeddings.fake_embedding_server`` in-process, embeds the same
+texts with plain serial batches (what ingest did before) and with
+``ScheduledEmbeddings``, then simulates an outage half-way through an
+ingest and shows how many texts the resumed run still has to send.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from langchain_openai import OpenAIEmbeddings
+
+from benchmarks.pdf_generator import page_lines
+from embeddings.embedding_cache import CachedEmbeddings
+from embeddings.embedding_scheduler import ScheduledEmbeddings
+from embeddings.fake_embedding_server import make_app, serve_in_thread
+
+
+def _client(base_url):
+    # No client-side retries: throttling is left to the code being measured
+    return OpenAIEmbeddings(
+        model="fake-256", base_url=base_url, api_key="fake",
+        check_embedding_ctx_length=False, max_retries=0,
+    )
+
+
+def _texts(count):
+    return [" ".join(page_lines(i // 40)[1 + i % 39].split()[1:]) + f" #{i}" for i in range(count)]
+
+
+def run_serial(base_url, texts, batch_size):
+    client = _client(base_url)
+    start = time.perf_counter()
+    try:
+        for i in range(0, len(texts), batch_size):
+            client.embed_documents(texts[i:i + batch_size])
+    except Exception as e:
+        return {"seconds": round(time.perf_counter() - start, 3), "failed": type(e).__name__,
+                "embedded": i}
+    return {"seconds": round(time.perf_counter() - start, 3), "embedded": len(texts)}
+
+
+def run_scheduled(base_url, texts, batch_size, concurrency):
+    scheduled = ScheduledEmbeddings(_client(base_url), max_concurrency=concurrency, batch_size=batch_size)
+    start = time.perf_counter()
+    scheduled.embed_documents(texts)
+    return {
+        "seconds": round(time.perf_counter() - start, 3),
+        "embedded": len(texts),
+        "final_concurrency": scheduled.concurrency,
+        "final_batch_size": scheduled.batch_size,
+        **scheduled.stats,
+    }
+
+
+def run_resume(texts, batch_size, concurrency, latency):
+    """Fail half-way through, then resume against a healthy server with the same cache."""
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "embeddings.sqlite3")
+        failing = make_app(latency=latency, fail_after=len(texts) // batch_size // 2)
+        server, base_url = serve_in_thread(failing)
+        scheduled = ScheduledEmbeddings(
+            CachedEmbeddings(_client(base_url), "fake:resume", path=path),
+            max_concurrency=concurrency, batch_size=batch_size, max_retries=1,
+        )
+        try:
+            scheduled.embed_documents(texts)
+            first = "completed"
+        except Exception as e:
+            first = type(e).__name__
+        server.should_exit = True
+
+        healthy = make_app(latency=latency)
+        server, base_url = serve_in_thread(healthy)
+        scheduled = ScheduledEmbeddings(
+            CachedEmbeddings(_client(base_url), "fake:resume", path=path),
+            max_concurrency=concurrency, batch_size=batch_size,
+        )
+        scheduled.embed_documents(texts)
+        server.should_exit = True
+        return {
+            "first_run": first,
+            "texts_sent_before_failure": failing.state.stats["texts"],
+            "texts_sent_on_resume": healthy.state.stats["texts"],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rps", type=float, default=8.0, help="server requests per second before 429s")
+    parser.add_argument("--latency", type=float, default=0.25, help="server seconds per request")
+    args = parser.parse_args()
+
+    texts = _texts(args.chunks)
+    results = {"settings": vars(args)}
+    for name, run in [
+        ("serial", lambda url: run_serial(url, texts, args.batch_size)),
+        ("scheduled", lambda url: run_scheduled(url, texts, args.batch_size, args.concurrency)),
+    ]:
+        app = make_app(rps=args.rps, latency=args.latency)
+        server, base_url = serve_in_thread(app)
+        results[name] = {**run(base_url), "server": dict(app.state.stats)}
+        server.should_exit = True
+    results["resume"] = run_resume(texts, args.batch_size, args.concurrency, args.latency)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Time to first token with a slow-tailed provider, alone vs hedged.
+
+Run from the ai-doc-assistant directory::
+
+    python -m benchmarks.hedging --requests 300 --slow-rate 0.05 --slow-delay 3
+
+The primary is a fake chat model that answers in ``--first-token`` seconds
+but takes ``--slow-delay`` seconds on a ``--slow-rate`` share of requests;
+the backup answers in ``--backup-first-token`` seconds. Reports TTFT
+p50/p95/p99 for:
+
+- "single": the primary alone,
+- "hedged": ``HedgedChatModel`` asking the backup after ``--hedge-after``
+  seconds without a token,
+- "failover": a primary that fails ``--error-rate`` of requests, alone and
+  hedged (errors vs answers),
+
+plus the share of requests that sent a hedge, i.e. the extra load.
+"""
+import argparse
+import json
+import statistics
+import time
+
+from chains.fake_llm import FakeStreamingChatModel
+from monitoring.tracing import tracer
+from providers.hedging import HedgedChatModel, LatencyTracker
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    if not samples:
+        return {}
+    pick = lambda pct: samples[min(len(samples) - 1, int(pct / 100 * len(samples)))]
+    return {
+        "p50_ms": round(statistics.median(samples) * 1000, 1),
+        "p95_ms": round(pick(95) * 1000, 1),
+        "p99_ms": round(pick(99) * 1000, 1),
+    }
+
+
+def run(model, requests):
+    """TTFT per request; failures are counted, not timed."""
+    ttft, errors = [], 0
+    tracer.spans.clear()
+    for i in range(requests):
+        start = time.perf_counter()
+        try:
+            for _ in model.stream(f"question {i}"):
+                ttft.append(time.perf_counter() - start)
+                break
+        except RuntimeError:
+            errors += 1
+    result = {"requests": requests, "errors": errors, **_percentiles(ttft)}
+    hedges = [span for span in tracer.spans if span["name"] == "llm.hedge"]
+    if hedges:
+        result["hedge_rate"] = round(sum(span["requests"] > 1 for span in hedges) / len(hedges), 3)
+        result["backup_wins"] = sum(span["winner"] == "backup" for span in hedges)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--first-token", type=float, default=0.02)
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-delay", type=float, default=3.0)
+    parser.add_argument("--backup-first-token", type=float, default=0.04)
+    parser.add_argument("--hedge-after", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    args = parser.parse_args()
+
+    def primary(**overrides):
+        settings = dict(first_token_delay=args.first_token, slow_rate=args.slow_rate,
+                        slow_delay=args.slow_delay)
+        return FakeStreamingChatModel(**{**settings, **overrides})
+
+    backup = FakeStreamingChatModel(first_token_delay=args.backup_first_token)
+
+    def hedged(model):
+        # A fresh tracker per run so the ranking is learned from this run only
+        return HedgedChatModel(candidates=[("primary", model), ("backup", backup)],
+                               hedge_after=args.hedge_after, tracker=LatencyTracker())
+
+    was_enabled, tracer.enabled = tracer.enabled, True
+    try:
+        results = {
+            "settings": vars(args),
+            "single": run(primary(), args.requests),
+            "hedged": run(hedged(primary()), args.requests),
+            "failover_single": run(primary(error_rate=args.error_rate), args.requests),
+            "failover_hedged": run(hedged(primary(error_rate=args.error_rate)), args.requests),
+        }
+    finally:
+        tracer.enabled = was_enabled
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Peak memory of ingesting scanned PDFs of growing size, old path vs streaming.
+
+Run from the ai-doc-assistant directory::
+
+    python -m benchmarks.ingest_memory --pages 50 200 400 --image-kb 1000
+
+Generates PDFs with a ``--image-kb`` page scan on every page, then ingests
+each one in a fresh process so peak RSS is measured on its own:
+
+- "in_memory": what ingest did before, reading the whole upload into
+  memory, ``PyPDFLoader.load()`` and splitting and embedding everything at
+  once,
+- "streaming": the upload copied to disk in blocks (``temporary_pdf``)
+  and pages read in windows through ``IngestPipeline``.
+
+Reports peak RSS above the process's footprint after imports.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.pdf_generator import make_pdf
+
+
+def _rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _child(mode, path):
+    from langchain_community.document_loaders import PyPDFLoader
+
+    from embeddings.fake_embeddings import FakeEmbeddings
+    from loaders.document_loader import iter_pdf_pages, temporary_pdf
+    from processing.ingest_pipeline import IngestPipeline
+    from processing.text_splitter import split_documents
+    from vectorstore.chroma_store import create_vectorstore
+
+    embeddings = FakeEmbeddings()
+    baseline = _rss_mb()
+    start = time.perf_counter()
+    with open(path, "rb") as upload:
+        if mode == "in_memory":
+            data = upload.read()
+            with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+                tmp.write(data)
+                tmp.flush()
+                chunks = split_documents(PyPDFLoader(tmp.name).load())
+                create_vectorstore(chunks, embeddings)
+        else:
+            with temporary_pdf(upload) as file_path:
+                # One worker: the pool's processes aren't counted in this RSS
+                IngestPipeline(embeddings).run(iter_pdf_pages(file_path, workers=1))
+    print(json.dumps({
+        "seconds": round(time.perf_counter() - start, 2),
+        "peak_rss_mb": round(_rss_mb() - baseline, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 200, 400])
+    parser.add_argument("--image-kb", type=int, default=1000, help="scan size per page")
+    parser.add_argument("--modes", nargs="+", default=["in_memory", "streaming"])
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for pages in args.pages:
+            path = make_pdf(os.path.join(workdir, f"scan_{pages}.pdf"), pages, image_bytes=args.image_kb * 1000)
+            result = {"pages": pages, "pdf_mb": round(os.path.getsize(path) / 1e6, 1)}
+            for mode in args.modes:
+                out = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.ingest_memory", "--child", mode, path],
+                    capture_output=True, text=True, check=True,
+                )
+                result[mode] = json.loads(out.stdout.strip().splitlines()[-1])
+            results.append(result)
+            print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        _child(sys.argv[2], sys.argv[3])
+    else:
+        main()
@@ -0,0 +1,90 @@
+import random
+
+
+_WORDS = (
+    "agreement party notice period termination clause payment invoice delivery "
+    "warranty liability service level uptime support contract renewal schedule "
+    "supplier customer obligation breach remedy confidential data security audit "
+    "report quarter revenue cost budget forecast device component assembly torque "
+    "voltage install maintenance inspection safety procedure manual section table"
+).split()
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+_DISCLAIMER = [
+    "This document is provided for information only and does not constitute an offer.",
+    "All trademarks are the property of their respective owners. Subject to change",
+    "without notice. Reproduction without written permission is prohibited.",
+]
+
+
+def page_lines(page, lines=40, seed=0, pages=None, boilerplate=False):
+    """Deterministic pseudo-text for one page: sentences with clause and part ids.
+
+    With ``boilerplate`` the page also gets a running header, a "Page N of M"
+    footer and, on every fifth page, the same legal disclaimer.
+    """
+    rng = random.Random(seed * 1_000_003 + page)
+    out = [f"Section {page + 1}. Document page {page + 1}"]
+    for line in range(lines - 1):
+        words = rng.choices(_WORDS, k=10)
+        words.insert(rng.randrange(10), f"PN-{rng.randrange(10000):04d}")
+        out.append(f"{page + 1}.{line} " + " ".join(words))
+    if boilerplate:
+        if page % 5 == 0:
+            out.extend(_DISCLAIMER)
+        out = ["ACME Industrial Systems - Supply Agreement - CONFIDENTIAL"] + out
+        out.append(f"Page {page + 1} of {pages or page + 1}")
+    return out
+
+
+def make_pdf(path, pages, lines=40, seed=0, boilerplate=False, image_bytes=0):
+    """Write a text PDF with ``pages`` pages using only the standard library.
+
+    ``image_bytes`` > 0 also draws an uncompressed grayscale image of about
+    that size on every page, like the page scans in a scanned report.
+    Objects are written as they are generated, so large files don't need
+    to fit in memory.
+    """
+    side = int(image_bytes ** 0.5)
+    offsets = {}
+    with open(path, "wb") as f:
+        def write_object(number, body):
+            offsets[number] = f.tell()
+            f.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+
+        f.write(b"%PDF-1.4\n")
+        write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        write_object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+        kids = []
+        number = 4
+        for page in range(pages):
+            text = " ".join(f"({_escape(line)}) '" for line in page_lines(page, lines, seed, pages, boilerplate))
+            stream = f"BT /F1 9 Tf 40 790 Td 11 TL {text} ET".encode("latin-1")
+            resources = "/Font << /F1 3 0 R >>"
+            if side:
+                pixels = random.Random(page).randbytes(side * side)
+                write_object(number, (
+                    b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceGray "
+                    b"/BitsPerComponent 8 /Length %d >>\nstream\n" % (side, side, len(pixels))
+                ) + pixels + b"\nendstream")
+                resources += f" /XObject << /Im1 {number} 0 R >>"
+                stream = b"q 612 0 0 792 0 0 cm /Im1 Do Q " + stream
+                number += 1
+            write_object(number, (
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                f"/Resources << {resources} >> /Contents {number + 1} 0 R >>"
+            ).encode())
+            kids.append(number)
+            write_object(number + 1, b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+            number += 2
+        write_object(2, f"<< /Type /Pages /Kids [{' '.join(f'{kid} 0 R' for kid in kids)}] /Count {pages} >>".encode())
+
+        xref = f.tell()
+        f.write(f"xref\n0 {number}\n0000000000 65535 f \n".encode())
+        f.write(b"".join(f"{offsets[i]:010d} 00000 n \n".encode() for i in range(1, number)))
+        f.write(f"trailer\n<< /Size {number} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return path
@@ -0,0 +1,171 @@
+"""How much of each prompt a provider prompt cache can reuse over a long chat.
+
+Run from the ai-doc-assistant directory::
+
+    python -m benchmarks.prompt_cache --pages 50 --turns 30
+
+Holds a ``--turns`` question conversation about one generated PDF through
+``build_chain`` (fake embeddings and chat model; the prompts are captured,
+not sent), with the history windowed and compacted the way the app does,
+and compares three prompt layouts:
+
+- "context_in_system": the old layout, retrieved context inside the system
+  message and history compacted every turn once it is full,
+- "stable_prefix_sliding": instructions, summary and history first and the
+  context with the question, still compacting every turn,
+- "stable_prefix": the same with step-wise compaction (``COMPACT_TO``),
+- "stable_prefix_headless": no summary at all, as the headless API keeps
+  it, with the history window dropping old messages in blocks.
+
+For each it reports, per request on average, the input tokens and what a
+prompt cache could serve:
+
+- "anthropic": a breakpoint at the end of the history (as
+  ``PrefixCachedChatAnthropic`` places it), reads priced at 0.1x and
+  writes at 1.25x of normal input; the old layout is sent unmarked,
+- "openai": automatic caching of the prefix shared with the previous
+  request, in 128-token steps from 1024 tokens, priced at 0.5x.
+
+Uncached input tokens are what the provider still has to process before
+the first token, so they drive time to first token as well as cost.
+"""
+import argparse
+import json
+import os
+import tempfile
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from benchmarks.pdf_generator import make_pdf
+from benchmarks.run_benchmarks import _queries
+from chains.conversational_chain import SYSTEM_PROMPT, build_chain, build_retriever
+from chains.fake_llm import FakeStreamingChatModel
+from embeddings.fake_embeddings import FakeEmbeddings
+from loaders.document_loader import iter_pdf_pages
+from memory.chat_memory import RollingHistory
+from processing.ingest_pipeline import IngestPipeline
+from processing.tokens import count_tokens
+
+
+# Smallest prefix the providers cache, and OpenAI's cache granularity
+MIN_CACHED_TOKENS = 1024
+OPENAI_CACHE_STEP = 128
+
+ANSWER = " ".join(["The document covers this on the cited page, with the figures given there."] * 10)
+
+
+class _CapturePrompts(BaseCallbackHandler):
+    def __init__(self):
+        self.prompts = []
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.prompts.append(messages[0])
+
+
+def _old_layout(messages):
+    # Context back inside the system message, the question on its own
+    summary = messages[0].content[len(SYSTEM_PROMPT.format(history_summary="")):]
+    context, question = messages[-1].content.rsplit("\n\nQuestion: ", 1)
+    system = SYSTEM_PROMPT.format(history_summary="") + summary + "\n" + context
+    return [SystemMessage(system), *messages[1:-1], HumanMessage(question)]
+
+
+def _summarize(summary, messages):
+    # Stands in for the LLM summary: about the same length every time
+    words = (summary + " " + " ".join(m["content"] for m in messages)).split()
+    return " ".join(words[-120:])
+
+
+def converse(chain, questions, history, compact=True):
+    capture = _CapturePrompts()
+    messages = []
+    for question in questions:
+        summary, chat_history = history.window(messages)
+        answer = "".join(chain.stream(
+            {"question": question, "chat_history": chat_history, "history_summary": summary},
+            config={"callbacks": [capture]},
+        ))
+        messages += [{"role": "user", "content": question}, {"role": "assistant", "content": answer}]
+        if compact:
+            history.compact(messages, _summarize)
+    return capture.prompts
+
+
+def _tokens(message):
+    return count_tokens(message.content) + 4
+
+
+def account(prompts, mark_prefix=True):
+    totals = dict.fromkeys(["input", "anthropic_read", "anthropic_write", "openai_read"], 0)
+    cached, previous = [], None
+    for prompt in prompts:
+        sizes = [_tokens(m) for m in prompt]
+        key = [(m.type, m.content) for m in prompt]
+        totals["input"] += sum(sizes)
+
+        prefix, prefix_tokens = key[:-1], sum(sizes[:-1])
+        if mark_prefix:
+            read = max((tokens for entry, tokens in cached if prefix[:len(entry)] == entry), default=0)
+            if prefix_tokens >= MIN_CACHED_TOKENS:
+                cached.append((prefix, prefix_tokens))
+                totals["anthropic_write"] += prefix_tokens - read
+            totals["anthropic_read"] += read
+
+        shared = 0
+        if previous is not None:
+            for (entry, size), old in zip(zip(key, sizes), previous):
+                if entry != old:
+                    break
+                shared += size
+        if shared >= MIN_CACHED_TOKENS:
+            totals["openai_read"] += shared // OPENAI_CACHE_STEP * OPENAI_CACHE_STEP
+        previous = key
+
+    n = len(prompts)
+    input_tokens = totals["input"]
+    return {
+        "input_tokens": round(input_tokens / n),
+        "anthropic": {
+            "cache_read_tokens": round(totals["anthropic_read"] / n),
+            "uncached_tokens": round((input_tokens - totals["anthropic_read"]) / n),
+            # Written tokens are billed as input plus a 25% surcharge
+            "relative_cost": round((input_tokens - 0.9 * totals["anthropic_read"]
+                                    + 0.25 * totals["anthropic_write"]) / input_tokens, 3),
+        },
+        "openai": {
+            "cache_read_tokens": round(totals["openai_read"] / n),
+            "uncached_tokens": round((input_tokens - totals["openai_read"]) / n),
+            "relative_cost": round((input_tokens - 0.5 * totals["openai_read"]) / input_tokens, 3),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=30)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = make_pdf(os.path.join(workdir, "chat.pdf"), args.pages)
+        vectorstore, _ = IngestPipeline(FakeEmbeddings()).run(iter_pdf_pages(path))
+    chain = build_chain(vectorstore, provider="fake", retriever=build_retriever(vectorstore),
+                        llm=FakeStreamingChatModel(response=ANSWER))
+    questions = _queries(args.pages, args.turns)
+
+    sliding = converse(chain, questions, RollingHistory(compact_to=1.0))
+    stepped = converse(chain, questions, RollingHistory())
+    headless = converse(chain, questions, RollingHistory(), compact=False)
+    results = {
+        "settings": vars(args),
+        "context_in_system": account([_old_layout(p) for p in sliding], mark_prefix=False),
+        "stable_prefix_sliding": account(sliding),
+        "stable_prefix": account(stepped),
+        "stable_prefix_headless": account(headless),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""Offline benchmarks for ingest, retrieval and time to first token.
+
+Run from the ai-doc-assistant directory::
+
+    python -m benchmarks.run_benchmarks --pages 10 100 500 2000
+
+Uses generated PDFs, deterministic fake embeddings and a fake streaming chat
+model, so results only depend on this code and the machine. Results are
+printed and written as JSON (``--output``) so runs can be compared.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import faiss
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from benchmarks.pdf_generator import make_pdf, page_lines
+from chains.conversational_chain import build_chain, build_retriever
+from chains.fake_llm import FakeStreamingChatModel
+from embeddings.fake_embeddings import FakeEmbeddings
+from loaders.document_loader import load_pdf
+from processing.text_splitter import DocumentSplitter
+from vectorstore.bm25_index import BM25Index
+from vectorstore.chroma_store import append_embeddings
+from vectorstore.index_engine import optimize_index
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def _ms(values):
+    return {
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+    }
+
+
+def _queries(pages, count):
+    # Lines that exist in the document, so retrieval has a right answer
+    questions = []
+    for i in range(count):
+        page = (i * 7919) % pages
+        questions.append(page_lines(page)[1 + i % 30])
+    return questions
+
+
+def _context_stats(question, docs, shingle=5):
+    # How much of the retrieved context is new text rather than a repeat of
+    # words another chunk already brought in (splitter overlap, near-duplicates):
+    # a word counts as repeated if the five words starting at it were seen before
+    seen = set()
+    tokens = distinct = 0
+    for doc in docs:
+        words = doc.page_content.split()
+        for i in range(len(words)):
+            gram = tuple(words[i:i + shingle])
+            distinct += gram not in seen
+            seen.add(gram)
+        tokens += len(words)
+    return tokens, distinct, any(question in doc.page_content for doc in docs)
+
+
+def _max_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if platform.system() == "Darwin" else 1024), 1)
+
+
+def _bench_retrieval(vectorstore, bm25, questions):
+    results = {}
+    for name, retriever in [
+        ("retrieval_dense_plain", build_retriever(vectorstore, mmr=False)),
+        ("retrieval_dense", build_retriever(vectorstore, mmr=True)),
+        ("retrieval_hybrid_plain", build_retriever(vectorstore, bm25=bm25, mmr=False)),
+        ("retrieval_hybrid", build_retriever(vectorstore, bm25=bm25, mmr=True)),
+        ("retrieval_hybrid_rerank", build_retriever(vectorstore, bm25=bm25, mmr=True, rerank=True)),
+    ]:
+        latencies = []
+        tokens = distinct = hits = 0
+        for question in questions:
+            start = time.perf_counter()
+            docs = retriever.invoke(question)
+            latencies.append(time.perf_counter() - start)
+            doc_tokens, doc_distinct, hit = _context_stats(question, docs)
+            tokens, distinct, hits = tokens + doc_tokens, distinct + doc_distinct, hits + hit
+        results[name] = {
+            **_ms(latencies),
+            "context_tokens": round(tokens / len(questions), 1),
+            # Share of the context that isn't repeated: more answer text per prompt token
+            "distinct_share": round(distinct / max(tokens, 1), 3),
+            "hit_rate": round(hits / len(questions), 3),
+        }
+    return results
+
+
+def bench_document(pages, workdir, queries=50, batch_size=64, embed_latency=0.0, first_token_delay=0.0):
+    path = make_pdf(os.path.join(workdir, f"bench_{pages}.pdf"), pages, boilerplate=True)
+    result = {"pages": pages, "pdf_bytes": os.path.getsize(path)}
+
+    start = time.perf_counter()
+    documents = load_pdf(path)
+    elapsed = time.perf_counter() - start
+    result["load"] = {"seconds": round(elapsed, 4), "pages_per_s": round(len(documents) / elapsed, 1)}
+
+    # The splitter used before boilerplate and duplicate removal, for comparison
+    start = time.perf_counter()
+    baseline = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=150).split_documents(documents)
+    elapsed = time.perf_counter() - start
+    result["split_baseline"] = {
+        "seconds": round(elapsed, 4),
+        "chunks": len(baseline),
+        "chars": sum(len(c.page_content) for c in baseline),
+        "pages_per_s": round(len(documents) / elapsed, 1),
+    }
+
+    splitter = DocumentSplitter()
+    start = time.perf_counter()
+    chunks = [chunk for document in documents for chunk in splitter.feed(document)]
+    chunks.extend(splitter.flush())
+    elapsed = time.perf_counter() - start
+    result["split"] = {
+        "seconds": round(elapsed, 4),
+        "chunks": len(chunks),
+        "chars": sum(len(c.page_content) for c in chunks),
+        "pages_per_s": round(len(documents) / elapsed, 1),
+        **splitter.stats,
+    }
+
+    embeddings = FakeEmbeddings(latency=embed_latency)
+    start = time.perf_counter()
+    vectors = []
+    for i in range(0, len(chunks), batch_size):
+        vectors.extend(embeddings.embed_documents([c.page_content for c in chunks[i:i + batch_size]]))
+    elapsed = time.perf_counter() - start
+    result["embed"] = {"seconds": round(elapsed, 4), "chunks_per_s": round(len(chunks) / elapsed, 1)}
+
+    start = time.perf_counter()
+    vectorstore = optimize_index(append_embeddings(None, chunks, vectors, embeddings))
+    elapsed = time.perf_counter() - start
+    result["index"] = {
+        "seconds": round(elapsed, 4),
+        "type": type(vectorstore.index).__name__,
+        "bytes": len(faiss.serialize_index(vectorstore.index)),
+    }
+
+    start = time.perf_counter()
+    bm25 = BM25Index.from_vectorstore(vectorstore)
+    result["bm25_index"] = {"seconds": round(time.perf_counter() - start, 4)}
+
+    result.update(_bench_retrieval(vectorstore, bm25, _queries(pages, queries)))
+
+    # The same document uploaded twice as slightly different revisions: each
+    # revision's chunks survive ingest, so retrieval sees near-duplicates
+    revised = [
+        document.model_copy(update={"page_content": document.page_content.replace("PN-", "Part PN-", 1)})
+        for document in documents
+    ]
+    splitter = DocumentSplitter()
+    revision_chunks = [chunk for document in revised for chunk in splitter.feed(document)]
+    revision_chunks.extend(splitter.flush())
+    revisions = append_embeddings(
+        None, chunks + revision_chunks,
+        vectors + embeddings.embed_documents([c.page_content for c in revision_chunks]), embeddings,
+    )
+    result["two_revisions"] = _bench_retrieval(
+        revisions, BM25Index.from_vectorstore(revisions), _queries(pages, queries),
+    )
+    retriever = build_retriever(vectorstore, bm25=bm25)
+
+    chain = build_chain(
+        vectorstore,
+        provider="fake",
+        retriever=retriever,
+        llm=FakeStreamingChatModel(first_token_delay=first_token_delay),
+    )
+    ttft = []
+    for question in _queries(pages, min(queries, 20)):
+        start = time.perf_counter()
+        stream = chain.stream({"question": question, "chat_history": []})
+        next(stream)
+        ttft.append(time.perf_counter() - start)
+        stream.close()
+    result["time_to_first_token"] = _ms(ttft)
+    result["max_rss_mb"] = _max_rss_mb()
+    return result
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 500, 2000])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--embed-latency", type=float, default=0.0,
+                        help="seconds slept per fake embedding request")
+    parser.add_argument("--first-token-delay", type=float, default=0.0,
+                        help="seconds the fake chat model waits before its first token")
+    parser.add_argument("--output", help="JSON file to write (default: benchmarks/results/<timestamp>.json)")
+    args = parser.parse_args()
+
+    run = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "settings": {
+            "queries": args.queries,
+            "embed_latency": args.embed_latency,
+            "first_token_delay": args.first_token_delay,
+        },
+        "documents": [],
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for pages in args.pages:
+            result = bench_document(
+                pages, workdir, queries=args.queries,
+                embed_latency=args.embed_latency, first_token_delay=args.first_token_delay,
+            )
+            run["documents"].append(result)
+            print(json.dumps(result))
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, run["timestamp"].replace(":", "") + ".json")
+    with open(output, "w") as f:
+        json.dump(run, f, indent=2)
+    print(f"Wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
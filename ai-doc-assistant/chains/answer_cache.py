@@ -0,0 +1,141 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+ANSWER_CACHE_THRESHOLD = float(os.getenv("DOCMIND_ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL = float(os.getenv("DOCMIND_ANSWER_CACHE_TTL", "3600"))
+
+# Pronouns that point back at something said earlier ("when does *it* expire?")
+_FOLLOW_UP_WORDS = {"it", "its", "they", "them", "their", "he", "she", "him", "her", "his"}
+# Openers that continue the previous turn ("what about the annex?")
+_FOLLOW_UP_OPENERS = ("what about", "how about", "and", "also", "then", "so", "why not")
+# Phrases that refer to earlier answers
+_FOLLOW_UP_PHRASES = (
+    "you said", "you say", "you mention", "you mentioned", "your answer", "previous answer", "last answer",
+    "the above",
+)
+_DEMONSTRATIVES = {"this", "that", "these", "those"}
+
+
+def normalize_question(question):
+    """Lowercase, strip punctuation and collapse whitespace."""
+    return " ".join(re.findall(r"[a-z0-9]+", question.lower()))
+
+
+def is_follow_up(question):
+    """Heuristic: does the question only make sense given the chat history?
+
+    Only references that need an antecedent count: personal pronouns,
+    continuation openers, mentions of earlier answers and a trailing
+    demonstrative ("explain that"). "This contract" or "more than 30
+    days" don't make a question a follow-up.
+    """
+    text = normalize_question(question)
+    words = text.split()
+    if len(words) < 3 or words[-1] in _DEMONSTRATIVES:
+        return True
+    if any(text == opener or text.startswith(opener + " ") for opener in _FOLLOW_UP_OPENERS):
+        return True
+    padded = f" {text} "
+    return any(f" {phrase} " in padded for phrase in _FOLLOW_UP_PHRASES) or any(
+        word in _FOLLOW_UP_WORDS for word in words
+    )
+
+
+def replay(answer, words_per_chunk=3):
+    """Yield a cached answer in small pieces so it renders like a live stream."""
+    pieces = re.findall(r"\S+\s*", answer)
+    for i in range(0, len(pieces), words_per_chunk):
+        yield "".join(pieces[i:i + words_per_chunk])
+
+
+class SemanticAnswerCache:
+    """Answers keyed by scope (documents + model) and question embedding.
+
+    A lookup hits when a stored question in the same scope has cosine
+    similarity of at least ``threshold`` with the new one, or the same
+    normalized text. Entries expire after ``ttl`` seconds and the least
+    recently used ones are evicted beyond ``max_entries``. Thread-safe, so
+    one instance can be shared by every session of the server.
+    """
+
+    def __init__(self, threshold=ANSWER_CACHE_THRESHOLD, ttl=ANSWER_CACHE_TTL, max_entries=2000):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # (scope, normalized question) -> (vector, answer, expires_at)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _purge_expired(self, now):
+        expired = [key for key, (_, _, expires_at) in self._entries.items() if expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+
+    def get(self, scope, question):
+        """Answer stored under the same normalized text in ``scope``, or None; never embeds."""
+        key = (scope, normalize_question(question))
+        with self._lock:
+            self._purge_expired(time.time())
+            if key in self._entries:
+                return self._hit(key)
+        return None
+
+    def lookup(self, scope, question, embed=None):
+        """Return ``(answer, vector)`` for ``question`` in ``scope``; ``answer`` is None on a miss.
+
+        Tries the exact (normalized) text first. ``embed`` is a callable
+        returning the question's embedding (or None); it is only called
+        when that fails and ``scope`` has entries to compare against, and
+        the vector it returned is handed back so ``store`` doesn't need to
+        embed again.
+        """
+        now = time.time()
+        text_key = (scope, normalize_question(question))
+        with self._lock:
+            self._purge_expired(now)
+            if text_key in self._entries:
+                return self._hit(text_key), None
+            candidates = [k for k, entry in self._entries.items() if k[0] == scope and entry[0] is not None]
+
+        vector = None
+        if embed is not None and candidates:
+            vector = embed()
+            vector = None if vector is None else self._unit(vector)
+        with self._lock:
+            candidates = [k for k in candidates if k in self._entries]
+            if vector is not None and candidates:
+                scores = np.stack([self._entries[k][0] for k in candidates]) @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    return self._hit(candidates[best]), vector
+            self.misses += 1
+        return None, vector
+
+    def _hit(self, key):
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return self._entries[key][1]
+
+    def store(self, scope, question, answer, vector=None):
+        """Cache ``answer``; without ``vector`` it can only be found by exact text."""
+        key = (scope, normalize_question(question))
+        if vector is not None:
+            vector = self._unit(vector)
+        with self._lock:
+            self._entries[key] = (vector, answer, time.time() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -1,63 +1,143 @@
-from langchain_openai import ChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_anthropic import ChatAnthropic
+import os
+
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnableBranch, RunnableLambda, RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
 
+from processing.tokens import count_tokens, truncate_to_tokens
+from providers.hedging import HEDGE_ENABLED, get_hedged_chat_model
+from providers.registry import get_chat_model
+from retrievers.answerability import NOT_IN_DOCUMENT
+from retrievers.hybrid_retriever import HybridRetriever
+from retrievers.reranker import MMR, RERANK
+
+
+# Most tokens of system prompt + retrieved context + history + question per call
+PROMPT_TOKEN_BUDGET = int(os.getenv("DOCMIND_PROMPT_TOKENS", "6000"))
 
+# Prompts are a stable prefix (these instructions, the conversation summary
+# and the chat history) followed by what changes with every question (the
+# retrieved context and the question), so provider prompt caches can reuse
+# the prefix from one turn to the next.
 SYSTEM_PROMPT = """\
 You are an intelligent document assistant. Answer the user's question using ONLY \
-the provided context from the uploaded document. If the answer is not in the context, \
-say so clearly. Be concise. Use bullet points or structured formatting when appropriate.
+the context from the uploaded document that comes with it. If the answer is not in \
+the context, say so clearly. Be concise. Use bullet points or structured formatting \
+when appropriate.
+{history_summary}"""
 
+QUESTION_PROMPT = """\
 Context:
 {context}
-"""
 
+Question: {question}"""
 
-def get_llm(provider="openai", model=None, api_key=None):
-    """Create an LLM instance for the given provider."""
-    if provider == "google":
-        return ChatGoogleGenerativeAI(
-            model=model or "gemini-2.0-flash",
-            google_api_key=api_key,
-            temperature=0.2,
-            convert_system_message_to_human=True,
-        )
-    elif provider == "anthropic":
-        return ChatAnthropic(
-            model=model or "claude-sonnet-4-20250514",
-            api_key=api_key,
-            temperature=0.2,
-        )
-    else:  # openai
-        return ChatOpenAI(
-            model=model or "gpt-4o-mini",
-            api_key=api_key,
-            temperature=0.2,
-            streaming=True,
-        )
+SUMMARY_PROMPT = """\
+Update the running summary of a conversation between a user and a document assistant. \
+Keep facts, names, numbers and open questions; drop pleasantries. Stay under 150 words.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}
+
+Updated summary:"""
+
+
+def get_llm(provider="openai", model=None, api_key=None, hedge=False):
+    """LLM instance for the given provider, created once and then reused.
+
+    With ``hedge=True`` a slow first token is raced against the other
+    providers that have an API key set (see ``providers.hedging``).
+    """
+    if hedge:
+        return get_hedged_chat_model(provider, model, api_key)
+    return get_chat_model(provider, model, api_key)
 
 
 def format_docs(docs):
     return "\n\n---\n\n".join(doc.page_content for doc in docs)
 
 
-def build_chain(vectorstore, provider="openai", model=None, api_key=None):
-    """Build a modern LCEL retrieval chain with chat history support."""
-    llm = get_llm(provider, model, api_key)
-    retriever = vectorstore.as_retriever(search_kwargs={"k": 4})
+def pack_docs(docs, max_tokens, provider="openai"):
+    """Keep the most relevant docs (in retrieval order) that fit in ``max_tokens``.
+
+    The top doc is always kept, truncated if it alone is over budget.
+    """
+    packed = []
+    for doc in docs:
+        cost = count_tokens(doc.page_content, provider) + 4
+        if cost > max_tokens:
+            if not packed:
+                packed.append(doc.model_copy(update={
+                    "page_content": truncate_to_tokens(doc.page_content, max(max_tokens, 64), provider),
+                }))
+            break
+        packed.append(doc)
+        max_tokens -= cost
+    return packed
+
+
+def format_summary(summary):
+    return f"\nSummary of the earlier conversation:\n{summary}\n" if summary else ""
+
+
+def build_retriever(vectorstore, k=4, doc_ids=None, bm25=None, mmr=MMR, rerank=RERANK):
+    """Retriever over ``vectorstore``; hybrid BM25 + dense if ``bm25`` is given.
+
+    If ``doc_ids`` is given, only chunks whose ``doc_id`` metadata is in that
+    list are returned (see ``CorpusIndex``). Docs come back with a
+    ``relevance_score`` in their metadata (see ``HybridRetriever``).
+    ``mmr`` and ``rerank`` control the post-retrieval stage.
+    """
+    return HybridRetriever(vectorstore=vectorstore, bm25=bm25, k=k, doc_ids=doc_ids, mmr=mmr, rerank=rerank)
+
+
+def build_chain(vectorstore, provider="openai", model=None, api_key=None, doc_ids=None, bm25=None,
+                token_budget=PROMPT_TOKEN_BUDGET, retriever=None, llm=None, hedge=HEDGE_ENABLED,
+                gate=None):
+    """Build a modern LCEL retrieval chain with chat history support.
+
+    Inputs are ``question``, ``chat_history`` and an optional
+    ``history_summary`` of older turns (see ``memory.chat_memory``). The
+    system prompt, summary and history form a prefix that stays the same
+    from one question to the next; the retrieved context goes in the last
+    message, with the question (see ``SYSTEM_PROMPT``). The context gets
+    whatever is left of ``token_budget`` after the rest of the prompt; the
+    least relevant chunks are dropped first. Pass ``docs`` in the input to
+    reuse documents already retrieved by the caller with the same
+    ``retriever``.
+
+    With an ``AnswerabilityGate`` as ``gate``, questions it refuses get
+    ``NOT_IN_DOCUMENT`` straight away instead of a generation (see
+    ``retrievers.answerability``).
+
+    See ``build_retriever`` for ``doc_ids`` and ``bm25``. ``llm`` overrides
+    the chat model that ``get_llm`` would create, with ``hedge`` passed on.
+    """
+    if llm is None:
+        llm = get_llm(provider, model, api_key, hedge=hedge)
+    if retriever is None:
+        retriever = build_retriever(vectorstore, doc_ids=doc_ids, bm25=bm25)
+    base_tokens = count_tokens(SYSTEM_PROMPT + QUESTION_PROMPT, provider)
+
+    def context(x):
+        used = base_tokens + count_tokens(x["question"], provider)
+        used += count_tokens(format_summary(x.get("history_summary", "")), provider)
+        used += sum(count_tokens(m.content, provider) + 4 for m in x.get("chat_history", []))
+        return format_docs(pack_docs(x["docs"], token_budget - used, provider))
 
     prompt = ChatPromptTemplate.from_messages([
         ("system", SYSTEM_PROMPT),
         MessagesPlaceholder("chat_history"),
-        ("human", "{question}"),
+        ("human", QUESTION_PROMPT),
     ])
 
-    chain = (
+    answer = (
         {
-            "context": lambda x: format_docs(retriever.invoke(x["question"])),
+            "context": context,
+            "history_summary": lambda x: format_summary(x.get("history_summary", "")),
             "chat_history": lambda x: x.get("chat_history", []),
             "question": lambda x: x["question"],
         }
@@ -65,5 +145,28 @@ def build_chain(vectorstore, provider="openai", model=None, api_key=None):
         | llm
         | StrOutputParser()
     )
+    if gate is not None:
+        answer = RunnableBranch(
+            (lambda x: not gate.answerable(x["question"], x["docs"]), RunnableLambda(lambda x: NOT_IN_DOCUMENT)),
+            answer,
+        )
+
+    retrieve = RunnablePassthrough.assign(
+        docs=lambda x: x["docs"] if "docs" in x else retriever.invoke(x["question"]),
+    )
+    return retrieve | answer
+
+
+def build_summarizer(provider="openai", model=None, api_key=None):
+    """Return ``summarize(summary, messages)`` for ``RollingHistory.compact``."""
+    chain = (
+        ChatPromptTemplate.from_messages([("human", SUMMARY_PROMPT)])
+        | get_llm(provider, model, api_key)
+        | StrOutputParser()
+    )
+
+    def summarize(summary, messages):
+        lines = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        return chain.invoke({"summary": summary or "(none)", "messages": lines}).strip()
 
-    return chain
+    return summarize
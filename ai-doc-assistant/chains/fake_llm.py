@@ -0,0 +1,62 @@
+import asyncio
+import random
+import re
+import time
+from typing import Any
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class FakeStreamingChatModel(BaseChatModel):
+    """Offline chat model that streams a fixed answer word by word.
+
+    ``first_token_delay`` and ``token_delay`` (seconds) simulate a provider's
+    time to first token and generation speed, for tests and benchmarks. A
+    ``slow_rate`` share of calls waits ``slow_delay`` before the first token
+    instead (a degraded provider's tail), and an ``error_rate`` share fails.
+    """
+
+    response: str = "This is a fake answer based on the provided context."
+    first_token_delay: float = 0.0
+    token_delay: float = 0.0
+    slow_rate: float = 0.0
+    slow_delay: float = 0.0
+    error_rate: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-streaming"
+
+    def _first_token_delay(self):
+        if random.random() < self.error_rate:
+            raise RuntimeError("fake provider error")
+        return self.slow_delay if random.random() < self.slow_rate else self.first_token_delay
+
+    def _pieces(self):
+        return re.findall(r"\S+\s*", self.response)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self._first_token_delay() + self.token_delay * len(self._pieces()))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.response))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        time.sleep(self._first_token_delay())
+        for piece in self._pieces():
+            if self.token_delay:
+                time.sleep(self.token_delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        await asyncio.sleep(self._first_token_delay())
+        for piece in self._pieces():
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                await run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
@@ -0,0 +1,164 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+
+from langchain_core.embeddings import Embeddings
+
+from monitoring.tracing import tracer
+
+
+CACHE_DIR = os.getenv("DOCMIND_CACHE_DIR", ".cache")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 512 MB of vectors
+_SQLITE_BATCH = 500
+
+
+def _pack(vector):
+    return array("f", vector).tobytes()
+
+
+def _unpack(blob):
+    vector = array("f")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper backed by a local SQLite store.
+
+    Vectors are keyed by a hash of (model id, text), so re-ingesting the same
+    document only sends chunks that have never been embedded with this model.
+    When the store grows past ``max_bytes`` the least recently used vectors
+    are evicted.
+    """
+
+    def __init__(self, embeddings, model_id, path=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.embeddings = embeddings
+        self.model_id = model_id
+        self.max_bytes = max_bytes
+        self.path = path or os.path.join(CACHE_DIR, "embeddings.sqlite3")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vectors ("
+            " key BLOB PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS vectors_last_used ON vectors(last_used)")
+        self._track_total()
+
+    def _track_total(self):
+        # Summing size scans every row (and the vector overflow pages before
+        # it), so the total is kept in a one-row table by triggers, in the
+        # same transaction as the insert or delete that changes it
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS vectors_total ("
+                " id INTEGER PRIMARY KEY CHECK (id = 0),"
+                " bytes INTEGER NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS vectors_total_insert AFTER INSERT ON vectors"
+                " BEGIN UPDATE vectors_total SET bytes = bytes + NEW.size; END"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS vectors_total_delete AFTER DELETE ON vectors"
+                " BEGIN UPDATE vectors_total SET bytes = bytes - OLD.size; END"
+            )
+            if self._conn.execute("SELECT 1 FROM vectors_total").fetchone() is None:
+                # Stores written before the total was kept are summed once
+                self._conn.execute(
+                    "INSERT INTO vectors_total (id, bytes) SELECT 0, COALESCE(SUM(size), 0) FROM vectors"
+                )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def _key(self, text, kind="doc"):
+        # Queries and documents are keyed apart: some providers embed them differently
+        return hashlib.sha256(f"{self.model_id}\0{kind}\0{text}".encode("utf-8")).digest()
+
+    def _lookup(self, keys):
+        found = {}
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(keys), _SQLITE_BATCH):
+                batch = keys[i:i + _SQLITE_BATCH]
+                marks = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM vectors WHERE key IN ({marks})", batch
+                ).fetchall()
+                found.update((bytes(key), _unpack(blob)) for key, blob in rows)
+                self._conn.execute(
+                    f"UPDATE vectors SET last_used = ? WHERE key IN ({marks})", [now, *batch]
+                )
+        return found
+
+    def _store(self, items):
+        now = time.time()
+        rows = []
+        for key, vector in items:
+            blob = _pack(vector)
+            rows.append((key, blob, len(blob), now))
+        with self._lock:
+            self._conn.execute("BEGIN")
+            # A key another thread stored meanwhile holds the same vector; a
+            # replace wouldn't fire the delete trigger and would skew the total
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO vectors (key, vector, size, last_used) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.execute("COMMIT")
+            self._evict()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT bytes FROM vectors_total").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Trim to 90% so we don't evict again on the very next insert
+        excess = total - int(self.max_bytes * 0.9)
+        self._conn.execute(
+            "DELETE FROM vectors WHERE key IN ("
+            " SELECT key FROM (SELECT key, size, SUM(size) OVER (ORDER BY last_used, key) AS running"
+            " FROM vectors) WHERE running - size < ?)",
+            (excess,),
+        )
+
+    def embed_documents(self, texts):
+        keys = [self._key(text) for text in texts]
+        cached = self._lookup(list(dict.fromkeys(keys)))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached:
+                missing.setdefault(key, text)
+
+        if missing:
+            # Only calls that reach the provider are timed
+            with tracer.span("embed.documents", texts=len(missing), cached=len(cached)):
+                vectors = self.embeddings.embed_documents(list(missing.values()))
+            fresh = list(zip(missing.keys(), vectors))
+            self._store(fresh)
+            cached.update(fresh)
+
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text):
+        key = self._key(text, kind="query")
+        cached = self._lookup([key])
+        if key in cached:
+            return cached[key]
+        with tracer.span("embed.query"):
+            vector = self.embeddings.embed_query(text)
+        self._store([(key, vector)])
+        return vector
@@ -1,14 +1,30 @@
-from langchain_openai import OpenAIEmbeddings
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from embeddings.embedding_cache import CachedEmbeddings
+from embeddings.embedding_scheduler import ScheduledEmbeddings
+from providers.registry import cached_client, get_embedding_model
 
 
-def get_embeddings(provider="openai", api_key=None):
-    """Get embedding model based on provider. Falls back to OpenAI."""
-    if provider == "google":
-        return GoogleGenerativeAIEmbeddings(
-            model="models/embedding-001",
-            google_api_key=api_key,
+def get_embeddings(provider="openai", api_key=None, cache=True, schedule=True):
+    """Get embedding model based on provider. Falls back to OpenAI.
+
+    With ``cache=True`` the model is wrapped in an on-disk cache so chunks
+    that were already embedded with the same model are not sent again.
+    With ``schedule=True`` large inputs are embedded as concurrent,
+    rate-limit aware batches, each cached as soon as it returns; local
+    backends batch and parallelise on their own and skip that. The
+    wrappers are created once per provider and API key and then reused.
+    ``provider="local"`` embeds on this machine without any API key.
+    """
+    embeddings, model_id = get_embedding_model(provider, api_key)
+    schedule = schedule and not getattr(embeddings, "local", False)
+    if cache:
+        embeddings = cached_client(
+            "cached_embeddings", provider, model_id, api_key,
+            lambda: CachedEmbeddings(embeddings, model_id=model_id),
+        )
+    if schedule:
+        inner = embeddings
+        embeddings = cached_client(
+            ("scheduled_embeddings", cache), provider, model_id, api_key,
+            lambda: ScheduledEmbeddings(inner, model_id=model_id),
         )
-    # OpenAI and Anthropic both use OpenAI embeddings
-    # (Anthropic doesn't have its own embedding model)
-    return OpenAIEmbeddings(api_key=api_key)
+    return embeddings
@@ -0,0 +1,185 @@
+import contextvars
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.embeddings import Embeddings
+
+from monitoring.tracing import tracer
+
+
+# Embedding requests in flight at once, per embeddings client
+EMBED_CONCURRENCY = int(os.getenv("DOCMIND_EMBED_CONCURRENCY", "4"))
+# Texts per request to start with; adapted to the observed latency
+EMBED_BATCH_SIZE = int(os.getenv("DOCMIND_EMBED_BATCH_SIZE", "64"))
+# Request latency the batch size is steered towards
+TARGET_BATCH_SECONDS = 2.0
+MAX_RETRIES = 6
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+
+_RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+_RATE_LIMIT_HINTS = ("rate limit", "ratelimit", "too many requests", "resource exhausted", "quota")
+
+
+def _status(error):
+    # openai/httpx errors carry status_code, google-api-core ones an int code
+    for owner in (error, getattr(error, "response", None)):
+        for name in ("status_code", "code"):
+            value = getattr(owner, name, None)
+            if isinstance(value, int):
+                return value
+    return None
+
+
+def is_rate_limited(error):
+    """True for 429s and provider quota errors, whatever SDK raised them."""
+    if _status(error) == 429:
+        return True
+    message = str(error).lower()
+    return "429" in message or any(hint in message for hint in _RATE_LIMIT_HINTS)
+
+
+def is_transient(error):
+    """Errors worth retrying: throttling, 5xx, timeouts and dropped connections."""
+    if is_rate_limited(error) or _status(error) in _RETRY_STATUS:
+        return True
+    name = type(error).__name__
+    return "Timeout" in name or "Connection" in name or isinstance(error, (TimeoutError, ConnectionError))
+
+
+def retry_after(error):
+    """Seconds from a Retry-After header on the error's response, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class ScheduledEmbeddings(Embeddings):
+    """Embeds large inputs as concurrent batches that adapt to the provider.
+
+    ``embed_documents`` splits its texts into batches and runs them on a
+    thread pool, at most ``concurrency`` requests at a time:
+
+    - concurrency grows by one after a round of fast successful requests
+      and halves when the provider throttles (AIMD),
+    - the batch size grows while requests finish well under
+      ``target_seconds`` and halves when they take longer,
+    - throttled and transient failures are retried with full-jitter
+      exponential backoff (or the server's Retry-After), and a 429 pauses
+      every worker, not just the one that hit it.
+
+    Wrap a ``CachedEmbeddings`` so every finished batch is stored as soon as
+    it returns: an ingest that fails part-way only re-sends the batches
+    that never completed.
+    """
+
+    def __init__(self, embeddings, model_id=None, max_concurrency=EMBED_CONCURRENCY,
+                 batch_size=EMBED_BATCH_SIZE, min_batch=8, max_batch=512,
+                 target_seconds=TARGET_BATCH_SECONDS, max_retries=MAX_RETRIES):
+        self.embeddings = embeddings
+        self.model_id = model_id or getattr(embeddings, "model_id", None)
+        self.max_concurrency = max(1, max_concurrency)
+        self.concurrency = max(1, self.max_concurrency // 2)
+        self.batch_size = batch_size
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.target_seconds = target_seconds
+        self.max_retries = max_retries
+        self.stats = {"requests": 0, "retries": 0, "throttled": 0}
+        self._active = 0
+        self._successes = 0
+        self._pause_until = 0.0
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(self.max_concurrency, thread_name_prefix="embed")
+
+    def _acquire(self):
+        with self._cond:
+            while True:
+                wait = self._pause_until - time.monotonic()
+                if wait <= 0 and self._active < self.concurrency:
+                    self._active += 1
+                    return
+                self._cond.wait(timeout=wait if wait > 0 else None)
+
+    def _release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def _succeeded(self, seconds):
+        with self._cond:
+            self.stats["requests"] += 1
+            if seconds > self.target_seconds:
+                self.batch_size = max(self.min_batch, self.batch_size // 2)
+                self._successes = 0
+                return
+            if seconds < self.target_seconds / 2:
+                self.batch_size = min(self.max_batch, self.batch_size * 3 // 2)
+            # Additive increase: one more slot per round of successful requests
+            self._successes += 1
+            if self._successes >= self.concurrency:
+                self._successes = 0
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+                self._cond.notify_all()
+
+    def _throttled(self, delay):
+        with self._cond:
+            self.stats["throttled"] += 1
+            self._successes = 0
+            self.concurrency = max(1, self.concurrency // 2)
+            self._pause_until = max(self._pause_until, time.monotonic() + delay)
+
+    def _call(self, func, *args):
+        for attempt in range(self.max_retries + 1):
+            self._acquire()
+            start = time.monotonic()
+            try:
+                result = func(*args)
+            except Exception as e:
+                if attempt == self.max_retries or not is_transient(e):
+                    raise
+                error = e
+            else:
+                self._succeeded(time.monotonic() - start)
+                return result
+            finally:
+                self._release()
+
+            delay = retry_after(error) or random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+            with self._cond:
+                self.stats["retries"] += 1
+            if is_rate_limited(error):
+                self._throttled(delay)
+            else:
+                time.sleep(delay)
+
+    def embed_documents(self, texts):
+        size = self.batch_size
+        batches = [texts[i:i + size] for i in range(0, len(texts), size)]
+        if len(batches) <= 1:
+            return self._call(self.embeddings.embed_documents, texts) if texts else []
+        with tracer.span("embed.schedule", texts=len(texts), batches=len(batches)) as span:
+            # Each batch runs in a copy of the caller's context (tracing setting included)
+            embed = self.embeddings.embed_documents
+            futures = [
+                self._executor.submit(contextvars.copy_context().run, self._call, embed, batch)
+                for batch in batches
+            ]
+            vectors = []
+            try:
+                for future in futures:
+                    vectors.extend(future.result())
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                raise
+            span.update(concurrency=self.concurrency, batch_size=self.batch_size, **self.stats)
+        return vectors
+
+    def embed_query(self, text):
+        return self._call(self.embeddings.embed_query, text)
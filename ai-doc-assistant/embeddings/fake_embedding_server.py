@@ -0,0 +1,141 @@
+"""OpenAI-compatible fake embedding server that injects latency and throttling.
+
+Run from the ai-doc-assistant directory::
+
+    python -m embeddings.fake_embedding_server --port 8100 --rps 5 --latency 0.2
+
+and point an OpenAI embeddings client at it::
+
+    OpenAIEmbeddings(base_url="http://127.0.0.1:8100/v1", api_key="fake",
+                     check_embedding_ctx_length=False, max_retries=0)
+
+Requests over ``--rps`` (token bucket) or ``--max-inflight`` get a 429 with
+a Retry-After header, ``--error-rate`` of the others fail with a 503, and
+``--fail-after`` makes every request after the first N fail, to simulate an
+outage in the middle of an ingest. GET /stats returns the counters.
+"""
+import argparse
+import asyncio
+import random
+import socket
+import threading
+import time
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from embeddings.fake_embeddings import FakeEmbeddings
+
+
+class Throttle:
+    """Token bucket of ``rps`` requests per second plus a cap on requests in flight."""
+
+    def __init__(self, rps=None, max_inflight=None):
+        self.rps = rps
+        self.max_inflight = max_inflight
+        self.tokens = float(rps or 0)
+        self.updated = time.monotonic()
+        self.inflight = 0
+
+    def admit(self):
+        """Return 0 if the request may run, otherwise seconds to wait before retrying."""
+        if self.max_inflight and self.inflight >= self.max_inflight:
+            return 0.5
+        if self.rps:
+            now = time.monotonic()
+            self.tokens = min(self.rps, self.tokens + (now - self.updated) * self.rps)
+            self.updated = now
+            if self.tokens < 1:
+                return (1 - self.tokens) / self.rps
+            self.tokens -= 1
+        return 0
+
+
+def make_app(rps=None, max_inflight=None, latency=0.0, error_rate=0.0, fail_after=None, size=256):
+    embeddings = FakeEmbeddings(size=size)
+    throttle = Throttle(rps, max_inflight)
+    stats = {"requests": 0, "served": 0, "throttled": 0, "errors": 0, "texts": 0}
+
+    async def create_embeddings(request):
+        stats["requests"] += 1
+        body = await request.json()
+        texts = body.get("input", [])
+        if isinstance(texts, str):
+            texts = [texts]
+
+        wait = throttle.admit()
+        if wait:
+            stats["throttled"] += 1
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                status_code=429, headers={"retry-after": f"{wait:.3f}"},
+            )
+        if (fail_after is not None and stats["served"] >= fail_after) or random.random() < error_rate:
+            stats["errors"] += 1
+            return JSONResponse({"error": {"message": "Service unavailable"}}, status_code=503)
+
+        throttle.inflight += 1
+        try:
+            await asyncio.sleep(latency)
+        finally:
+            throttle.inflight -= 1
+        vectors = embeddings.embed_documents([str(text) for text in texts])
+        stats["served"] += 1
+        stats["texts"] += len(texts)
+        tokens = sum(len(str(text).split()) for text in texts)
+        return JSONResponse({
+            "object": "list",
+            "model": body.get("model", embeddings.model),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": vector}
+                for i, vector in enumerate(vectors)
+            ],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+    async def get_stats(request):
+        return JSONResponse(stats)
+
+    app = Starlette(routes=[
+        Route("/v1/embeddings", create_embeddings, methods=["POST"]),
+        Route("/stats", get_stats),
+    ])
+    app.state.stats = stats
+    return app
+
+
+def serve_in_thread(app, host="127.0.0.1", port=0):
+    """Start ``app`` with uvicorn on a background thread; returns ``(server, base_url)``."""
+    import uvicorn
+
+    if not port:
+        with socket.socket() as sock:
+            sock.bind((host, 0))
+            port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, f"http://{host}:{port}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--rps", type=float, help="requests per second before 429s")
+    parser.add_argument("--max-inflight", type=int, help="concurrent requests before 429s")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests failing with 503")
+    parser.add_argument("--fail-after", type=int, help="fail every request after this many")
+    args = parser.parse_args()
+
+    import uvicorn
+    app = make_app(args.rps, args.max_inflight, args.latency, args.error_rate, args.fail_after)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
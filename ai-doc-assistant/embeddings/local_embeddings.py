@@ -0,0 +1,142 @@
+import hashlib
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+# "hashing" for the dependency-free backend, otherwise a sentence-transformers model name or path
+LOCAL_EMBED_MODEL = os.getenv("DOCMIND_LOCAL_EMBED_MODEL", "hashing")
+# sentence-transformers backend: "torch", "onnx" or "openvino"
+LOCAL_EMBED_BACKEND = os.getenv("DOCMIND_LOCAL_EMBED_BACKEND", "torch")
+# Worker processes for the hashing backend; 0 means one per CPU core
+LOCAL_EMBED_WORKERS = int(os.getenv("DOCMIND_LOCAL_EMBED_WORKERS", "0"))
+# Below this many texts the worker round trip costs more than it saves
+PARALLEL_MIN_TEXTS = 256
+HASHING_SIZE = 768
+
+_WORD_RE = re.compile(r"\w+")
+# Odd 64-bit multipliers that mix two word hashes into a bigram hash
+_MIX = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F], dtype=np.uint64)
+
+
+@lru_cache(maxsize=1 << 16)
+def _word_hash(word):
+    # blake2b rather than hash(): vectors are cached on disk and must not change between runs
+    return int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "little")
+
+
+def _hash_batch(texts, size):
+    """Signed feature hashing of word unigrams and bigrams into a ``(len(texts), size)`` array."""
+    word_lists = [_WORD_RE.findall(text.lower()) for text in texts]
+    lengths = np.array([len(words) for words in word_lists], dtype=np.int64)
+    total = int(lengths.sum())
+    hashes = np.fromiter(
+        (_word_hash(word) for words in word_lists for word in words), dtype=np.uint64, count=total,
+    )
+    rows = np.repeat(np.arange(len(texts)), lengths)
+
+    # Bigrams from neighbouring word hashes, except across two texts
+    bigrams = hashes[:-1] * _MIX[0] ^ hashes[1:] * _MIX[1]
+    same_text = rows[:-1] == rows[1:]
+    features = np.concatenate([hashes, bigrams[same_text]])
+    feature_rows = np.concatenate([rows, rows[:-1][same_text]])
+
+    buckets = (features % np.uint64(size)).astype(np.int64)
+    signs = np.where(features >> np.uint64(63), 1.0, -1.0)
+    counts = np.bincount(feature_rows * size + buckets, weights=signs, minlength=len(texts) * size)
+    matrix = counts.reshape(len(texts), size).astype(np.float32)
+    # Sublinear term frequency, so a word repeated on every line doesn't dominate
+    matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+class HashingEmbeddings(Embeddings):
+    """Offline embeddings from hashed word and word-pair counts. No model, no network.
+
+    Each unigram and bigram is hashed into one of ``size`` signed buckets
+    (the hashing trick), counts are damped with ``log1p`` and the vectors
+    L2-normalised, so cosine similarity behaves like TF overlap. Quality is
+    below a neural model, but it's deterministic, needs nothing installed
+    and makes a usable air-gapped fallback. Batches of at least
+    ``PARALLEL_MIN_TEXTS`` are spread over ``workers`` processes.
+    """
+
+    local = True
+
+    def __init__(self, size=HASHING_SIZE, workers=None):
+        self.size = size
+        self.workers = workers or LOCAL_EMBED_WORKERS or os.cpu_count() or 1
+        self.model = f"hashing-{size}"
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _executor(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def embed_array(self, texts):
+        """Embed ``texts`` into a float32 array, one row per text."""
+        if self.workers <= 1 or len(texts) < PARALLEL_MIN_TEXTS:
+            return _hash_batch(texts, self.size)
+        step = -(-len(texts) // self.workers)
+        parts = [texts[i:i + step] for i in range(0, len(texts), step)]
+        return np.vstack(list(self._executor().map(_hash_batch, parts, [self.size] * len(parts))))
+
+    def embed_documents(self, texts):
+        return self.embed_array(list(texts)).tolist()
+
+    def embed_query(self, text):
+        return _hash_batch([text], self.size)[0].tolist()
+
+
+class SentenceTransformerEmbeddings(Embeddings):
+    """A sentence-transformers model run on the local CPU.
+
+    ``backend="onnx"`` (or ``"openvino"``) runs the exported, optionally
+    quantized model through ONNX Runtime instead of PyTorch; both use
+    every core for each batch. Inputs are encoded ``batch_size`` at a time
+    and the vectors normalised, so FAISS distances match cosine.
+    """
+
+    local = True
+
+    def __init__(self, model_name, backend=LOCAL_EMBED_BACKEND, batch_size=64):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                f"DOCMIND_LOCAL_EMBED_MODEL={model_name} needs sentence-transformers: "
+                "pip install sentence-transformers (set it to 'hashing' to use no model at all)"
+            ) from e
+        self.model = model_name
+        self.backend = backend
+        self.batch_size = batch_size
+        self.client = SentenceTransformer(model_name, device="cpu", backend=backend)
+
+    def embed_array(self, texts):
+        return self.client.encode(
+            list(texts), batch_size=self.batch_size, convert_to_numpy=True, normalize_embeddings=True,
+        ).astype(np.float32)
+
+    def embed_documents(self, texts):
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text):
+        return self.embed_array([text])[0].tolist()
+
+
+def get_local_embeddings(model=LOCAL_EMBED_MODEL):
+    """``(embeddings, model_id)`` for the local backend selected by ``model``."""
+    if model == "hashing":
+        embeddings = HashingEmbeddings()
+        return embeddings, f"local:{embeddings.model}"
+    embeddings = SentenceTransformerEmbeddings(model)
+    return embeddings, f"local:{model}:{embeddings.backend}"
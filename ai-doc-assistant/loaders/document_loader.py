@@ -1,5 +1,138 @@
+import os
+import shutil
+import tempfile
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+
 from langchain_community.document_loaders import PyPDFLoader
-def load_pdf(file_path):
-    loader = PyPDFLoader(file_path)
-    return loader.load()
+from langchain_core.documents import Document
+from pypdf import PdfReader
+
+from monitoring.tracing import traced
+
+
+# Worker processes used to extract large PDFs; 0 means one per CPU core
+PDF_WORKERS = int(os.getenv("DOCMIND_PDF_WORKERS", "0"))
+# Pages extracted between clears of the reader's object cache. pypdf caches
+# every object a reader resolves (page scans included), so clearing it after
+# each window keeps memory flat
+PAGE_WINDOW = int(os.getenv("DOCMIND_PAGE_WINDOW", "16"))
+# Bytes copied at a time when an upload is spooled to disk
+COPY_CHUNK_BYTES = 1024 * 1024
+# Below this many pages the process pool start-up costs more than it saves
+PARALLEL_MIN_PAGES = 32
+
+
+@contextmanager
+def temporary_pdf(source=None):
+    """Yield the path of a temporary ``.pdf`` file that is deleted on exit, even on errors.
+
+    A binary file object ``source`` (such as a Streamlit upload) is copied
+    into it ``COPY_CHUNK_BYTES`` at a time, never as one in-memory copy;
+    without one the caller writes the file.
+    """
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            if source is not None:
+                source.seek(0)
+                shutil.copyfileobj(source, tmp, COPY_CHUNK_BYTES)
+        yield path
+    finally:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def _open_reader(file_path):
+    # Given a path, pypdf reads the whole file into memory; a file object is read on demand
+    return PdfReader(open(file_path, "rb"))
+
+
+def _extract_pages(reader, start, stop):
+    """Extract the text of pages ``[start, stop)``, then drop what ``reader`` cached."""
+    try:
+        return [reader.pages[i].extract_text(extraction_mode="plain").strip() for i in range(start, stop)]
+    finally:
+        # Every object the reader resolved (page scans included) stays cached
+        # until cleared; the xref and page tree are kept, so the next window
+        # doesn't parse them again
+        reader.resolved_objects.clear()
+
+
+# Each worker process's reader, opened once by ``_init_worker``
+_worker_reader = None
+
+
+def _init_worker(file_path):
+    global _worker_reader
+    _worker_reader = _open_reader(file_path)
+
+
+def _extract_worker_pages(start, stop):
+    return _extract_pages(_worker_reader, start, stop)
+
+
+def _page_ranges(first, total, size):
+    return [(start, min(start + size, total)) for start in range(first, total, size)]
+
+
+def iter_pdf_pages(file_path, workers=None, window=PAGE_WINDOW):
+    """Yield a PDF's pages as Documents, in order, as soon as each is extracted.
+
+    Pages are read ``window`` at a time by one reader per process, whose
+    object cache is cleared after each window, so only a window's worth of
+    parsed PDF objects is in memory however large the file is. Large PDFs
+    are extracted by a process pool of ``workers`` processes (default
+    ``PDF_WORKERS``, or one per core) with at most two windows per worker
+    in flight. Page order and metadata match
+    ``PyPDFLoader.load()``.
+    """
+    workers = workers or PDF_WORKERS or os.cpu_count() or 1
+    pages = PyPDFLoader(file_path).lazy_load()
+
+    # The first page comes from PyPDFLoader itself so the other pages can
+    # reuse its document-level metadata verbatim.
+    first = next(pages, None)
+    pages.close()
+    if first is None:
+        return
+    yield first
+    total = first.metadata.get("total_pages", 0)
+    reader = _open_reader(file_path)
+    try:
+        labels = reader.page_labels
+
+        def documents(start, texts):
+            for offset, text in enumerate(texts):
+                yield Document(
+                    page_content=text,
+                    metadata={**first.metadata, "page": start + offset, "page_label": labels[start + offset]},
+                )
+
+        ranges = _page_ranges(1, total, window)
+        if workers <= 1 or total < PARALLEL_MIN_PAGES:
+            for start, stop in ranges:
+                yield from documents(start, _extract_pages(reader, start, stop))
+            return
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(file_path,)) as pool:
+            pending = deque()
+            for start, stop in ranges:
+                pending.append((start, pool.submit(_extract_worker_pages, start, stop)))
+                if len(pending) >= 2 * workers:
+                    start, future = pending.popleft()
+                    yield from documents(start, future.result())
+            while pending:
+                start, future = pending.popleft()
+                yield from documents(start, future.result())
+    finally:
+        reader.stream.close()
+
 
+@traced("load_pdf")
+def load_pdf(file_path, workers=None):
+    """Load a PDF into one Document per page. See ``iter_pdf_pages``."""
+    return list(iter_pdf_pages(file_path, workers=workers))
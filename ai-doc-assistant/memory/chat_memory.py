@@ -1,3 +1,107 @@
-# This module is no longer used.
-# Chat history is managed via st.session_state.messages in app.py.
-# Kept for reference only.
+import os
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from processing.tokens import count_tokens
+
+
+# Most tokens of verbatim chat history sent with each question
+HISTORY_TOKEN_BUDGET = int(os.getenv("DOCMIND_HISTORY_TOKENS", "1500"))
+# Share of the budget left verbatim after compacting: folding more than just
+# what fell out keeps the summary and the start of the history, the cached
+# prompt prefix, the same for the next few turns
+COMPACT_TO = 0.7
+
+
+def _message_tokens(msg, provider):
+    # Counted once per message and remembered on the message dict
+    key = f"tokens_{provider}"
+    if key not in msg:
+        msg[key] = count_tokens(msg["content"], provider) + 4
+    return msg[key]
+
+
+def to_message(msg):
+    # Built once per message and remembered on the message dict, like its token count
+    if "message" not in msg:
+        cls = HumanMessage if msg["role"] == "user" else AIMessage
+        msg["message"] = cls(content=msg["content"])
+    return msg["message"]
+
+
+class RollingHistory:
+    """Chat history bounded by a token budget, with a rolling summary of older turns.
+
+    ``window`` returns the summary plus the newest messages that fit in
+    ``max_tokens`` and never calls the LLM, so it adds nothing to time to
+    first token. ``compact`` folds messages that fell out of the window into
+    the summary, one incremental LLM call at a time, and is meant to run
+    after an answer has been shown; it folds down to ``compact_to`` of the
+    budget so it only runs every few turns. Messages are the
+    ``{"role", "content"}`` dicts kept in ``st.session_state.messages``, a
+    list or a ``Conversation`` (see ``memory.conversation_store``); only the
+    messages since the summary are ever read.
+    """
+
+    def __init__(self, max_tokens=HISTORY_TOKEN_BUDGET, provider="openai", compact_to=COMPACT_TO):
+        self.max_tokens = max_tokens
+        self.provider = provider
+        self.compact_to = compact_to
+        self.summary = ""
+        self.summarized = 0  # messages[:summarized] are folded into the summary
+
+    def reset(self):
+        self.summary = ""
+        self.summarized = 0
+
+    def _window_start(self, messages, max_tokens=None, end=None):
+        budget = (max_tokens or self.max_tokens) - count_tokens(self.summary, self.provider)
+        start = len(messages) if end is None else end
+        while start > self.summarized:
+            cost = _message_tokens(messages[start - 1], self.provider)
+            if cost > budget:
+                break
+            budget -= cost
+            start -= 1
+        return start
+
+    def _block_start(self, messages, start, end):
+        # Older messages are dropped in blocks of (1 - compact_to) of the budget,
+        # counted from the oldest kept message, so the start of the history (part
+        # of the cached prompt prefix) holds for a few turns instead of moving
+        # with every new one. Without a summarizer this is the only thing that does.
+        block = self.max_tokens * (1 - self.compact_to)
+        boundary, size = self.summarized, 0
+        for i in range(self.summarized, end - 1):
+            size += _message_tokens(messages[i], self.provider)
+            if size >= block:
+                boundary, size = i + 1, 0
+                if boundary >= start:
+                    return boundary
+        return start
+
+    def window(self, messages, end=None):
+        """Return ``(summary, chat_history)`` to send with the next question.
+
+        Only ``messages[:end]`` are considered; pass ``end`` rather than a
+        slice so a ``Conversation`` isn't read back from the start.
+        """
+        if len(messages) < self.summarized:
+            # The chat was cleared underneath us
+            self.reset()
+        end = len(messages) if end is None else end
+        start = self._window_start(messages, end=end)
+        if start > self.summarized:
+            start = self._block_start(messages, start, end)
+        return self.summary, [to_message(msg) for msg in messages[start:end]]
+
+    def compact(self, messages, summarize):
+        """Fold messages outside the window into the summary.
+
+        ``summarize(summary, messages)`` must return the updated summary text.
+        """
+        start = self._window_start(messages)
+        if start > self.summarized:
+            start = max(start, self._window_start(messages, int(self.max_tokens * self.compact_to)))
+            self.summary = summarize(self.summary, messages[self.summarized:start])
+            self.summarized = start
@@ -0,0 +1,196 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Sequence
+
+from embeddings.embedding_cache import CACHE_DIR
+
+
+CONVERSATION_DB = os.getenv("DOCMIND_CONVERSATION_DB") or os.path.join(CACHE_DIR, "conversations.sqlite3")
+# Messages loaded when a conversation is opened, and shown per page of history
+HISTORY_PAGE = int(os.getenv("DOCMIND_HISTORY_PAGE", "20"))
+
+
+def conversation_id(user_id, doc_ids):
+    """Stable id of ``user_id``'s conversation about the document set ``doc_ids``."""
+    key = "\0".join([user_id, *sorted(doc_ids)])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+class Conversation(Sequence):
+    """One user's messages about one document set, read from the store on demand.
+
+    Behaves like the list of ``{"role", "content", "web_results"}`` dicts the
+    app used to keep: indexes are positions in the whole conversation and
+    ``len()`` is its full length, but only the newest messages are loaded
+    when it is opened. Older ones are read a range at a time the first time
+    they are indexed, then kept. ``append`` writes through to the store.
+    ``summary`` and ``summarized`` are the saved ``RollingHistory`` state.
+    """
+
+    def __init__(self, store, conversation_id, user_id, doc_key, length, offset, messages,
+                 summary="", summarized=0):
+        self.store = store
+        self.id = conversation_id
+        self.user_id = user_id
+        self.doc_key = doc_key
+        self.summary = summary
+        self.summarized = summarized
+        self._length = length
+        self._offset = offset  # position of self._messages[0]
+        self._messages = messages
+
+    def __len__(self):
+        return self._length
+
+    def _load_from(self, start):
+        if start < self._offset:
+            older = self.store.read(self.id, start, self._offset)
+            self._messages[:0] = older
+            self._offset = start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._length)
+            if start >= stop:
+                return []
+            self._load_from(start)
+            return self._messages[start - self._offset:stop - self._offset:step]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("conversation index out of range")
+        self._load_from(index)
+        return self._messages[index - self._offset]
+
+    def recent(self, count):
+        """The newest ``count`` messages, oldest first."""
+        return self[max(0, self._length - count):]
+
+    def append(self, message):
+        seq = self.store.append(self.id, self.user_id, self.doc_key, message)
+        if seq != self._length:
+            # Another session added messages to this conversation meanwhile
+            self._messages += self.store.read(self.id, self._length, seq)
+        self._messages.append(message)
+        self._length = seq + 1
+
+    def clear(self):
+        self.store.clear(self.id)
+        self._messages, self._offset, self._length = [], 0, 0
+        self.summary, self.summarized = "", 0
+
+    def save_summary(self, summary, summarized):
+        """Persist ``RollingHistory`` state so a resumed session doesn't summarize again."""
+        if (summary, summarized) != (self.summary, self.summarized):
+            self.summary, self.summarized = summary, summarized
+            self.store.save_summary(self.id, summary, summarized)
+
+
+class ConversationStore:
+    """Conversations kept in a local SQLite database (WAL), keyed by user and documents.
+
+    Messages are clustered by (conversation, position), so opening a
+    conversation or paging back through it reads one index range, however
+    long the conversation is.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or CONVERSATION_DB
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            " id TEXT PRIMARY KEY,"
+            " user_id TEXT NOT NULL,"
+            " doc_key TEXT NOT NULL,"
+            " length INTEGER NOT NULL,"
+            " summary TEXT NOT NULL DEFAULT '',"
+            " summarized INTEGER NOT NULL DEFAULT 0,"
+            " updated REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            " conversation TEXT NOT NULL,"
+            " seq INTEGER NOT NULL,"
+            " role TEXT NOT NULL,"
+            " content TEXT NOT NULL,"
+            " web_results TEXT,"
+            " created REAL NOT NULL,"
+            " PRIMARY KEY (conversation, seq)) WITHOUT ROWID"
+        )
+
+    def open(self, user_id, doc_ids, page=HISTORY_PAGE):
+        """``Conversation`` for ``user_id`` and ``doc_ids`` with its newest messages loaded.
+
+        Loads the last ``page`` messages, or everything since the saved
+        summary if that is more (``RollingHistory`` needs those right away).
+        """
+        cid = conversation_id(user_id, doc_ids)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT length, summary, summarized FROM conversations WHERE id = ?", (cid,)
+            ).fetchone()
+        length, summary, summarized = row or (0, "", 0)
+        offset = max(0, min(summarized, length - page))
+        return Conversation(
+            self, cid, user_id, ",".join(sorted(doc_ids)), length, offset,
+            self.read(cid, offset, length), summary=summary, summarized=summarized,
+        )
+
+    def read(self, cid, start, stop):
+        """Messages ``start`` to ``stop`` (exclusive) of conversation ``cid``."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT role, content, web_results FROM messages"
+                " WHERE conversation = ? AND seq >= ? AND seq < ? ORDER BY seq",
+                (cid, start, stop),
+            ).fetchall()
+        return [
+            {"role": role, "content": content, "web_results": web_results}
+            for role, content, web_results in rows
+        ]
+
+    def append(self, cid, user_id, doc_key, message):
+        """Add ``message`` at the end of conversation ``cid`` and return its position."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT length FROM conversations WHERE id = ?", (cid,)).fetchone()
+                seq = row[0] if row else 0
+                self._conn.execute(
+                    "INSERT INTO messages (conversation, seq, role, content, web_results, created)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (cid, seq, message["role"], message["content"], message.get("web_results"), now),
+                )
+                self._conn.execute(
+                    "INSERT INTO conversations (id, user_id, doc_key, length, updated) VALUES (?, ?, ?, ?, ?)"
+                    " ON CONFLICT(id) DO UPDATE SET length = excluded.length, updated = excluded.updated",
+                    (cid, user_id, doc_key, seq + 1, now),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return seq
+
+    def save_summary(self, cid, summary, summarized):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE conversations SET summary = ?, summarized = ? WHERE id = ?",
+                (summary, summarized, cid),
+            )
+
+    def clear(self, cid):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute("DELETE FROM messages WHERE conversation = ?", (cid,))
+            self._conn.execute("DELETE FROM conversations WHERE id = ?", (cid,))
+            self._conn.execute("COMMIT")
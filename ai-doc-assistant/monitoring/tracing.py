@@ -0,0 +1,217 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+TRACING_ENABLED = os.getenv("DOCMIND_TRACING", "0") == "1"
+# Append every finished span to this JSONL file (optional)
+TRACE_FILE = os.getenv("DOCMIND_TRACE_FILE", "")
+
+_trace_id = contextvars.ContextVar("docmind_trace_id", default=None)
+# Per-context override of Tracer.enabled (see Tracer.use)
+_enabled = contextvars.ContextVar("docmind_tracing", default=None)
+
+
+class _NoopSpan(dict):
+    def __setitem__(self, key, value):
+        pass
+
+    def update(self, *args, **kwargs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Tracer:
+    """Records timed spans for ingest and question handling.
+
+    Spans are dicts with ``name``, ``start``, ``duration_ms``, ``trace_id``
+    and free-form attributes (token counts, chunk counts, ...). The last
+    ``max_spans`` are kept in memory for the in-app latency panel and the
+    Prometheus export; with ``jsonl_path`` every span is also appended to a
+    JSONL file. When disabled, ``span`` and ``traced`` cost one attribute
+    check and record nothing. ``enabled`` is the process-wide default;
+    ``use`` overrides it for the current context only, such as one app
+    session's script thread.
+    """
+
+    def __init__(self, enabled=TRACING_ENABLED, max_spans=2000, jsonl_path=TRACE_FILE):
+        self.enabled = enabled
+        self.jsonl_path = jsonl_path
+        self.spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    @property
+    def active(self):
+        """Whether spans are recorded in the current context."""
+        scoped = _enabled.get()
+        return self.enabled if scoped is None else scoped
+
+    def use(self, enabled):
+        """Record spans (or not) in the current context, whatever ``enabled`` says elsewhere."""
+        _enabled.set(enabled)
+
+    @contextmanager
+    def trace(self, name, **attrs):
+        """Span that also groups every span opened inside it under one trace id."""
+        if not self.active:
+            yield _NOOP
+            return
+        token = _trace_id.set(uuid.uuid4().hex[:16])
+        try:
+            with self.span(name, **attrs) as span:
+                yield span
+        finally:
+            _trace_id.reset(token)
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """Time the enclosed block. Set extra attributes on the yielded dict."""
+        if not self.active:
+            yield _NOOP
+            return
+        span = dict(attrs)
+        start = time.time()
+        begin = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            span["error"] = type(e).__name__
+            raise
+        finally:
+            self.record(name, time.perf_counter() - begin, start=start, **span)
+
+    def record(self, name, seconds, start=None, **attrs):
+        """Record an already-measured span."""
+        if not self.active:
+            return
+        span = {
+            "name": name,
+            "start": round(start or time.time() - seconds, 6),
+            "duration_ms": round(seconds * 1000, 3),
+            "trace_id": _trace_id.get(),
+            **attrs,
+        }
+        with self._lock:
+            self.spans.append(span)
+            if self.jsonl_path:
+                with open(self.jsonl_path, "a") as f:
+                    f.write(json.dumps(span, default=str) + "\n")
+
+    def stats(self):
+        """Per span name: count and p50/p95/max duration in ms over the kept spans."""
+        with self._lock:
+            spans = list(self.spans)
+        durations = {}
+        for span in spans:
+            durations.setdefault(span["name"], []).append(span["duration_ms"])
+        stats = {}
+        for name, values in sorted(durations.items()):
+            values.sort()
+            stats[name] = {
+                "count": len(values),
+                "p50_ms": values[len(values) // 2],
+                "p95_ms": values[min(len(values) - 1, int(len(values) * 0.95))],
+                "max_ms": values[-1],
+            }
+        return stats
+
+    def prometheus(self):
+        """Span latency summaries in the Prometheus text exposition format."""
+        lines = [
+            "# HELP docmind_span_seconds Latency of DocMind pipeline stages.",
+            "# TYPE docmind_span_seconds summary",
+        ]
+        for name, s in self.stats().items():
+            lines.append(f'docmind_span_seconds{{stage="{name}",quantile="0.5"}} {s["p50_ms"] / 1000:.6f}')
+            lines.append(f'docmind_span_seconds{{stage="{name}",quantile="0.95"}} {s["p95_ms"] / 1000:.6f}')
+            lines.append(f'docmind_span_seconds_count{{stage="{name}"}} {s["count"]}')
+        return "\n".join(lines) + "\n"
+
+
+tracer = Tracer()
+
+
+def traced(name):
+    """Decorator that records a span named ``name`` around each call."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.active:
+                return func(*args, **kwargs)
+            with tracer.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def token_usage(response):
+    """Input, output and prompt cache tokens of an ``LLMResult``, 0 where not reported.
+
+    ``cache_read`` is the part of the input served from the provider's
+    prompt cache, ``cache_creation`` the part written to it.
+    """
+    usage = {}
+    for generations in response.generations:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            usage = getattr(message, "usage_metadata", None) or usage
+    details = usage.get("input_token_details") or {}
+    return {
+        "input_tokens": usage.get("input_tokens", 0),
+        "output_tokens": usage.get("output_tokens", 0),
+        "cache_read": details.get("cache_read") or 0,
+        "cache_creation": details.get("cache_creation") or 0,
+    }
+
+
+class LLMTracingHandler(BaseCallbackHandler):
+    """LangChain callback recording time to first token, generation time and tokens.
+
+    ``usage`` adds up ``token_usage`` over the calls it saw, whether or not
+    tracing is enabled.
+    """
+
+    def __init__(self, provider=None, model=None):
+        self.provider = provider
+        self.model = model
+        self.usage = {}
+        self._runs = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        if tracer.active:
+            self._runs[run_id] = {"begin": time.perf_counter(), "start": time.time(), "first": None}
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        run = self._runs.get(run_id)
+        if run is not None and run["first"] is None:
+            run["first"] = time.perf_counter()
+            tracer.record("llm.first_token", run["first"] - run["begin"], start=run["start"],
+                          provider=self.provider, model=self.model)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        usage = token_usage(response)
+        for key, value in usage.items():
+            self.usage[key] = self.usage.get(key, 0) + value
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        tracer.record(
+            "llm.generate", time.perf_counter() - run["begin"], start=run["start"],
+            provider=self.provider, model=self.model, **usage,
+        )
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        run = self._runs.pop(run_id, None)
+        if run is not None:
+            tracer.record("llm.generate", time.perf_counter() - run["begin"], start=run["start"],
+                          provider=self.provider, model=self.model, error=type(error).__name__)
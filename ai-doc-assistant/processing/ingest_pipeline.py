@@ -0,0 +1,211 @@
+import contextvars
+import queue
+import threading
+import time
+
+from monitoring.tracing import tracer
+
+from processing.text_splitter import DocumentSplitter
+from vectorstore.chroma_store import append_embeddings
+from vectorstore.index_engine import optimize_index
+
+
+_DONE = object()
+
+
+class _StageError:
+    def __init__(self, error):
+        self.error = error
+
+
+class IngestPipeline:
+    """Streaming ingest: load → split → embed → index as overlapping stages.
+
+    Pages flow into the splitter as they are extracted, chunks are batched
+    into embedding requests as soon as a batch fills up, and each embedded
+    batch is appended to the FAISS index. Stages run in their own threads
+    and are connected by bounded queues, so a slow stage applies
+    backpressure instead of letting work pile up in memory. The index stage
+    runs on the calling thread, which is also where ``on_progress`` is
+    called (Streamlit elements can only be updated from there).
+    """
+
+    def __init__(self, embeddings, batch_size=64, queue_size=8, on_progress=None, splitter=None):
+        self.embeddings = embeddings
+        self.splitter = splitter or DocumentSplitter()
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.on_progress = on_progress
+        self.stats = {"pages": 0, "chunks": 0, "embedded": 0, "indexed": 0}
+        # Seconds each stage spent working (not waiting on its queues)
+        self.busy = {"load": 0.0, "split": 0.0, "embed": 0.0, "index": 0.0}
+        self._stop = threading.Event()
+
+    def _put(self, q, item):
+        # Keep retrying so a stopped pipeline doesn't leave threads blocked
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        while True:
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return _DONE
+
+    def _run_stage(self, work, out_q):
+        try:
+            work()
+        except Exception as e:
+            self._put(out_q, _StageError(e))
+        else:
+            self._put(out_q, _DONE)
+
+    def _load(self, pages, page_q):
+        pages = iter(pages)
+        while True:
+            begin = time.perf_counter()
+            page = next(pages, _DONE)
+            self.busy["load"] += time.perf_counter() - begin
+            if page is _DONE or not self._put(page_q, page):
+                return
+            self.stats["pages"] += 1
+
+    def _send_full_batches(self, batch, batch_q):
+        while len(batch) >= self.batch_size:
+            self.stats["chunks"] += self.batch_size
+            if not self._put(batch_q, batch[:self.batch_size]):
+                return None
+            batch = batch[self.batch_size:]
+        return batch
+
+    def _split(self, page_q, batch_q):
+        batch = []
+        while True:
+            page = self._get(page_q)
+            if page is _DONE:
+                break
+            if isinstance(page, _StageError):
+                raise page.error
+            begin = time.perf_counter()
+            batch.extend(self.splitter.feed(page))
+            self.busy["split"] += time.perf_counter() - begin
+            batch = self._send_full_batches(batch, batch_q)
+            if batch is None:
+                return
+        # Pages the splitter held back to learn headers and footers
+        begin = time.perf_counter()
+        batch.extend(self.splitter.flush())
+        self.busy["split"] += time.perf_counter() - begin
+        batch = self._send_full_batches(batch, batch_q)
+        if batch:
+            self.stats["chunks"] += len(batch)
+            self._put(batch_q, batch)
+
+    def _embed(self, batch_q, vector_q):
+        done = False
+        while not done:
+            batch = self._get(batch_q)
+            if batch is _DONE:
+                break
+            if isinstance(batch, _StageError):
+                raise batch.error
+            # Batches that queued up while the last request ran go out together,
+            # so a scheduling embeddings client can send them concurrently
+            batches = [batch]
+            while len(batches) < self.queue_size:
+                try:
+                    batch = batch_q.get_nowait()
+                except queue.Empty:
+                    break
+                if batch is _DONE:
+                    done = True
+                    break
+                if isinstance(batch, _StageError):
+                    raise batch.error
+                batches.append(batch)
+
+            begin = time.perf_counter()
+            vectors = self.embeddings.embed_documents([c.page_content for b in batches for c in b])
+            self.busy["embed"] += time.perf_counter() - begin
+            for chunks in batches:
+                self.stats["embedded"] += len(chunks)
+                if not self._put(vector_q, (chunks, vectors[:len(chunks)])):
+                    return
+                vectors = vectors[len(chunks):]
+
+    def _report(self):
+        if self.on_progress:
+            self.on_progress(dict(self.stats))
+
+    def run(self, pages):
+        """Consume an iterable of page Documents and return ``(vectorstore, stats)``."""
+        with tracer.span("ingest") as span:
+            vectorstore, stats = self._run(pages)
+            span.update(stats)
+        for stage, seconds in self.busy.items():
+            tracer.record(f"ingest.{stage}", seconds, **stats)
+        return vectorstore, stats
+
+    def _run(self, pages):
+        page_q = queue.Queue(self.queue_size)
+        batch_q = queue.Queue(self.queue_size)
+        vector_q = queue.Queue(self.queue_size)
+        stages = [
+            (lambda: self._load(pages, page_q), page_q),
+            (lambda: self._split(page_q, batch_q), batch_q),
+            (lambda: self._embed(batch_q, vector_q), vector_q),
+        ]
+        # Each stage runs in a copy of the caller's context, so its spans
+        # follow the caller's tracing setting (see Tracer.use)
+        threads = [
+            threading.Thread(target=contextvars.copy_context().run, args=(self._run_stage, *stage))
+            for stage in stages
+        ]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        vectorstore = None
+        try:
+            while True:
+                try:
+                    item = vector_q.get(timeout=0.25)
+                except queue.Empty:
+                    self._report()
+                    continue
+                if item is _DONE:
+                    break
+                if isinstance(item, _StageError):
+                    raise item.error
+                chunks, vectors = item
+                begin = time.perf_counter()
+                vectorstore = append_embeddings(vectorstore, chunks, vectors, self.embeddings)
+                self.busy["index"] += time.perf_counter() - begin
+                self.stats["indexed"] += len(chunks)
+                self._report()
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+
+        if vectorstore is None:
+            raise ValueError("No text could be extracted from this document.")
+        self._report()
+        # Chunks were appended to a flat index; switch type now the size is known
+        begin = time.perf_counter()
+        vectorstore = optimize_index(vectorstore)
+        self.busy["index"] += time.perf_counter() - begin
+        return vectorstore, {**self.stats, **self.splitter.stats}
+
+
+def ingest(pages, embeddings, on_progress=None, batch_size=64):
+    """Run an ``IngestPipeline`` over ``pages``. Returns ``(vectorstore, stats)``."""
+    pipeline = IngestPipeline(embeddings, batch_size=batch_size, on_progress=on_progress)
+    return pipeline.run(pages)
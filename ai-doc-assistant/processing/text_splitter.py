@@ -1,8 +1,247 @@
+import hashlib
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+from itertools import chain
+
+import numpy as np
+from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-def split_documents(documents):
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=800,
-        chunk_overlap=150
-    )
-    return splitter.split_documents(documents)
+from processing.tokens import count_tokens
+
+
+CHUNK_SIZE = int(os.getenv("DOCMIND_CHUNK_SIZE", "800"))
+CHUNK_OVERLAP = int(os.getenv("DOCMIND_CHUNK_OVERLAP", "150"))
+# "chars" or "tokens": the unit CHUNK_SIZE and CHUNK_OVERLAP are measured in
+CHUNK_UNIT = os.getenv("DOCMIND_CHUNK_UNIT", "chars")
+
+# Lines at the top and bottom of a page that may be headers or footers
+EDGE_LINES = 3
+# Pages buffered before furniture is detected; later pages use what was learned
+FURNITURE_WARMUP = 8
+# A normalized edge line on this share of pages (and at least MIN_REPEATS) is furniture
+FURNITURE_RATIO = 0.5
+MIN_REPEATS = 3
+# Edge lines at least this long that already appeared on an earlier page
+# (disclaimers, legal notices in a footer) are dropped; body lines never are
+REPEATED_LINE_CHARS = 40
+# Also drop chunks that nearly duplicate an earlier one (SimHash); exact
+# repeats are always dropped
+NEAR_DUPLICATES = os.getenv("DOCMIND_NEAR_DUPLICATES", "0") == "1"
+# SimHash bits that may differ for two chunks to count as near-duplicates
+NEAR_DUPLICATE_BITS = 3
+
+_DIGITS = re.compile(r"\d+")
+_SPACES = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def _line_key(line):
+    # Page numbers and dates change from page to page; the furniture around them doesn't
+    return _SPACES.sub(" ", _DIGITS.sub("#", line.lower())).strip()
+
+
+def _edge_range(lines):
+    # Lines [0, top) and [bottom, len) are edge lines; short pages are all edge
+    top = min(EDGE_LINES, len(lines))
+    return top, max(top, len(lines) - EDGE_LINES)
+
+
+def _edge_keys(lines):
+    top, bottom = _edge_range(lines)
+    return {key for key in map(_line_key, lines[:top] + lines[bottom:]) if key}
+
+
+# Odd 64-bit multipliers that mix word hashes into shingle hashes
+_MIX = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9], dtype=np.uint64)
+
+
+def simhashes(word_lists, shingle=3):
+    """64-bit SimHash over word shingles for each list of words, in one numpy pass.
+
+    Similar texts get hashes that differ in few bits. Uses Python's string
+    hash, so values are only comparable within one process (which is all
+    the duplicate filter needs).
+    """
+    # Pad only the texts shorter than one shingle; copying every list costs as much as hashing it
+    word_lists = [words if len(words) >= shingle else words + [""] * (shingle - len(words)) for words in word_lists]
+    lengths = np.array([len(words) for words in word_lists])
+    words = np.fromiter(map(hash, chain.from_iterable(word_lists)), dtype=np.int64, count=lengths.sum())
+    words = words.view(np.uint64)
+
+    count = len(words) - shingle + 1
+    hashes = np.zeros(count, dtype=np.uint64)
+    for i in range(shingle):
+        hashes ^= words[i:i + count] * _MIX[i]
+    hashes ^= hashes >> np.uint64(29)
+    hashes *= _MIX[0]
+
+    # Drop the shingles that would straddle two texts
+    ends = np.cumsum(lengths)
+    valid = np.ones(count, dtype=bool)
+    for k in range(1, shingle):
+        straddling = ends - k
+        valid[straddling[straddling < count]] = False
+    bits = np.unpackbits(hashes[valid].view(np.uint8), bitorder="little").reshape(-1, 64)
+
+    per_text = lengths - shingle + 1
+    offsets = np.concatenate([[0], np.cumsum(per_text)[:-1]])
+    votes = np.add.reduceat(bits, offsets, axis=0, dtype=np.uint32) * 2 > per_text[:, None]
+    return [int(value) for value in np.packbits(votes, axis=1, bitorder="little").view(np.uint64).ravel()]
+
+
+class DuplicateFilter:
+    """Flags exact and, if ``max_bits`` > 0, near-duplicate chunks (SimHash within ``max_bits``).
+
+    Exact repeats cost one hash of the text. Near-duplicate candidates are found by splitting the 64-bit hash into
+    four 16-bit bands: two hashes within 3 bits of each other must agree on
+    at least one band, so only chunks sharing a band are compared.
+    """
+
+    def __init__(self, max_bits=NEAR_DUPLICATE_BITS):
+        self.max_bits = max_bits
+        self._exact = set()
+        self._bands = [{} for _ in range(4)] if max_bits < 4 else None
+        self._hashes = []
+
+    def _bands_of(self, value):
+        return [(value >> (16 * i)) & 0xFFFF for i in range(4)]
+
+    def _is_near_duplicate(self, value):
+        if self._bands is None:
+            candidates = self._hashes
+        else:
+            candidates = {h for band, key in zip(self._bands, self._bands_of(value)) for h in band.get(key, ())}
+        if any(bin(value ^ other).count("1") <= self.max_bits for other in candidates):
+            return True
+        if self._bands is None:
+            self._hashes.append(value)
+        else:
+            for band, key in zip(self._bands, self._bands_of(value)):
+                band.setdefault(key, []).append(value)
+        return False
+
+    def check(self, texts):
+        """One flag per text: True if it (or something very close) was seen before.
+
+        Texts that are not duplicates are remembered, including against the
+        ones earlier in the same call.
+        """
+        if self.max_bits > 0 and texts:
+            values = simhashes([text.lower().split() for text in texts])
+        else:
+            values = [None] * len(texts)
+        flags = []
+        for text, value in zip(texts, values):
+            digest = hashlib.blake2b(text.encode(), digest_size=16).digest()
+            if digest in self._exact:
+                flags.append(True)
+                continue
+            self._exact.add(digest)
+            flags.append(value is not None and self._is_near_duplicate(value))
+        return flags
+
+
+class DocumentSplitter:
+    """Splits the pages of one document into chunks ready for embedding.
+
+    Repeated page furniture (running headers, footers, "Page 3 of 40") is
+    learned from the first ``FURNITURE_WARMUP`` pages and stripped before
+    splitting, as are long edge lines repeated from an earlier page; only
+    the ``EDGE_LINES`` at the top and bottom of a page are looked at. Chunks
+    that repeat an earlier chunk (boilerplate paragraphs, repeated tables)
+    are dropped; with ``near_duplicates`` so are chunks that nearly repeat
+    one, which costs a SimHash per chunk. Pages are fed one at a time
+    with ``feed`` so it works inside the streaming ingest pipeline; call
+    ``flush`` after the last page. ``unit="tokens"`` measures chunk size and
+    overlap in tokens instead of characters.
+    """
+
+    def __init__(self, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, unit=CHUNK_UNIT,
+                 strip_furniture=True, dedupe=True, near_duplicates=NEAR_DUPLICATES, provider="openai"):
+        self._splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=(lambda text: count_tokens(text, provider)) if unit == "tokens" else len,
+        )
+        self.strip_furniture = strip_furniture
+        max_bits = NEAR_DUPLICATE_BITS if near_duplicates else 0
+        self.duplicates = DuplicateFilter(max_bits) if dedupe else None
+        self.stats = {"boilerplate_lines": 0, "duplicates": 0}
+        self._edge_counts = Counter()
+        self._long_lines = set()
+        self._pages_seen = 0
+        self._pending = []
+
+    def _is_furniture(self, key):
+        count = self._edge_counts[key]
+        return count >= MIN_REPEATS and count >= FURNITURE_RATIO * self._pages_seen
+
+    def _strip(self, lines):
+        if not self.strip_furniture:
+            return lines
+        # Furniture sits at the page edges, so the body is never scanned
+        top, bottom = _edge_range(lines)
+        long_lines = set()
+
+        def keep(line):
+            if self._is_furniture(_line_key(line)):
+                return False
+            text = line.strip()
+            if len(text) >= REPEATED_LINE_CHARS:
+                if text in self._long_lines:
+                    return False
+                long_lines.add(text)
+            return True
+
+        head = [line for line in lines[:top] if keep(line)]
+        tail = [line for line in lines[bottom:] if keep(line)]
+        # Repeats within one page are kept; only later pages lose them
+        self._long_lines |= long_lines
+        dropped = len(lines) - bottom + top - len(head) - len(tail)
+        if not dropped:
+            return lines
+        body = lines[top:bottom]
+        if not any(line.strip() for line in chain(head, body, tail)):
+            # Nothing but "boilerplate": more likely short repetitive pages, keep them
+            return lines
+        self.stats["boilerplate_lines"] += dropped
+        return head + body + tail
+
+    def _split(self, page, lines):
+        texts = self._splitter.split_text("\n".join(self._strip(lines)))
+        if self.duplicates is not None:
+            flags = self.duplicates.check(texts)
+            self.stats["duplicates"] += sum(flags)
+            texts = [text for text, duplicate in zip(texts, flags) if not duplicate]
+        # A shallow copy is enough: page metadata only holds scalars
+        return [Document(page_content=text, metadata=dict(page.metadata)) for text in texts]
+
+    def feed(self, page):
+        """Add one page Document; returns the chunks that are ready."""
+        lines = page.page_content.splitlines()
+        self._pages_seen += 1
+        self._edge_counts.update(_edge_keys(lines))
+        if self.strip_furniture and self._pages_seen <= FURNITURE_WARMUP:
+            self._pending.append((page, lines))
+            if self._pages_seen < FURNITURE_WARMUP:
+                return []
+            return self.flush()
+        return self._split(page, lines)
+
+    def flush(self):
+        """Chunks of pages still held back for furniture detection."""
+        pending, self._pending = self._pending, []
+        return [chunk for page, lines in pending for chunk in self._split(page, lines)]
+
+
+def split_documents(documents, **kwargs):
+    """Split page Documents into deduplicated chunks (see ``DocumentSplitter``)."""
+    splitter = DocumentSplitter(**kwargs)
+    chunks = []
+    for document in documents:
+        chunks.extend(splitter.feed(document))
+    chunks.extend(splitter.flush())
+    return chunks
@@ -0,0 +1,38 @@
+from functools import lru_cache
+
+
+# Rough characters-per-token when no tokenizer is available
+_CHARS_PER_TOKEN = {"openai": 4.0, "google": 4.0, "anthropic": 3.5}
+
+
+@lru_cache(maxsize=None)
+def _encoding(provider):
+    # OpenAI's tokenizer is exact for OpenAI and a close estimate for the
+    # others. tiktoken downloads its tables on first use, so air-gapped
+    # hosts fall back to the character heuristic.
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text, provider="openai"):
+    """Count (or closely estimate) the tokens ``text`` costs with ``provider``."""
+    if not text:
+        return 0
+    encoding = _encoding(provider)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return int(len(text) / _CHARS_PER_TOKEN.get(provider, 4.0)) + 1
+
+
+def truncate_to_tokens(text, max_tokens, provider="openai"):
+    """Cut ``text`` down to at most ``max_tokens`` tokens."""
+    if max_tokens <= 0:
+        return ""
+    encoding = _encoding(provider)
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+    return text[:int(max_tokens * _CHARS_PER_TOKEN.get(provider, 4.0))]
@@ -0,0 +1,49 @@
+"""Anthropic chat model that marks the stable prompt prefix for prompt caching.
+
+``build_chain`` lays prompts out as a stable prefix (system instructions,
+conversation summary, chat history) followed by the per-question context
+and question. Anthropic only caches up to an explicit ``cache_control``
+breakpoint, so this model puts one on the last block before the final
+user message. The next turn's prefix extends this one, and Anthropic finds
+the earlier breakpoint when it looks back from the new one, so the history
+is read from the cache instead of processed again. Prefixes shorter than
+the model's minimum (1024-2048 tokens) are simply not cached.
+
+Imported by the "anthropic" factory in ``providers.registry`` only, so the
+SDK is still loaded on first use.
+"""
+from langchain_anthropic import ChatAnthropic
+
+
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def _as_blocks(content):
+    return [{"type": "text", "text": content}] if isinstance(content, str) else content
+
+
+def mark_cached_prefix(payload):
+    """Put a cache breakpoint on the end of ``payload``'s stable prefix, in place.
+
+    That is the message before the last one, or the system prompt when the
+    last message is the only one.
+    """
+    messages = payload.get("messages") or []
+    if len(messages) > 1:
+        target, key = messages[-2], "content"
+    elif payload.get("system"):
+        target, key = payload, "system"
+    else:
+        return payload
+    blocks = _as_blocks(target[key])
+    if blocks and isinstance(blocks[-1], dict) and blocks[-1].get("type") == "text":
+        blocks[-1] = {**blocks[-1], "cache_control": CACHE_CONTROL}
+        target[key] = blocks
+    return payload
+
+
+class PrefixCachedChatAnthropic(ChatAnthropic):
+    """``ChatAnthropic`` with a cache breakpoint after the stable prompt prefix."""
+
+    def _get_request_payload(self, input_, *, stop=None, **kwargs):
+        return mark_cached_prefix(super()._get_request_payload(input_, stop=stop, **kwargs))
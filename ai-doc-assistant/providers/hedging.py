@@ -0,0 +1,296 @@
+"""Hedged chat requests: race a second provider when the first one is slow.
+
+``HedgedChatModel`` streams from the fastest of several chat models. The
+primary (the candidate with the best recent p95 time to first token) is
+asked first; if no content has arrived after ``hedge_after`` seconds, or it
+fails before answering, the same prompt goes to the next candidate. The
+first one to stream actual content wins; the other requests are cancelled
+right away, which closes their HTTP connections even while they are still
+waiting for a first token.
+"""
+import asyncio
+import math
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.language_models.chat_models import generate_from_stream
+from langchain_core.outputs import ChatGenerationChunk
+
+from monitoring.tracing import tracer
+from providers.registry import KEY_NAMES, PROVIDERS, cached_client, get_chat_model
+
+
+HEDGE_ENABLED = os.getenv("DOCMIND_HEDGE", "0") == "1"
+# Seconds without a first token before the next provider is asked too
+HEDGE_AFTER = float(os.getenv("DOCMIND_HEDGE_AFTER", "2.0"))
+# Time to first token samples kept per candidate
+LATENCY_WINDOW = 200
+# Samples a candidate needs before its percentiles are trusted
+MIN_SAMPLES = 5
+# Counted as the time to first token of a request that failed
+FAILURE_SECONDS = 30.0
+
+_DONE = object()
+
+
+class _Failed:
+    def __init__(self, error):
+        self.error = error
+
+
+class LatencyTracker:
+    """Rolling time-to-first-token samples per candidate, shared by every session."""
+
+    def __init__(self, window=LATENCY_WINDOW, min_samples=MIN_SAMPLES):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self._lock:
+            self._samples.setdefault(name, deque(maxlen=self.window)).append(seconds)
+
+    def record_failure(self, name):
+        self.record(name, FAILURE_SECONDS)
+
+    def percentile(self, name, pct):
+        """``pct`` percentile of ``name``'s samples, or None with too few of them."""
+        with self._lock:
+            samples = sorted(self._samples.get(name, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, math.ceil(pct / 100 * len(samples)) - 1)]
+
+    def rank(self, names, pct=95):
+        """``names`` fastest first by ``pct`` percentile; unmeasured ones keep their order, last."""
+        def key(name):
+            value = self.percentile(name, pct)
+            return math.inf if value is None else value
+        return sorted(names, key=key)
+
+    def stats(self):
+        """p50/p95/p99 and sample count per candidate."""
+        with self._lock:
+            names = list(self._samples)
+        return {
+            name: {
+                "samples": len(self._samples[name]),
+                **{f"p{pct}": self.percentile(name, pct) for pct in (50, 95, 99)},
+            }
+            for name in names
+        }
+
+
+latency_tracker = LatencyTracker()
+
+
+def _has_content(message):
+    # Role-only and metadata chunks don't count as a first token
+    content = message.content
+    if isinstance(content, str):
+        return bool(content)
+    return any(block.get("text") if isinstance(block, dict) else block for block in content)
+
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _background_loop():
+    """Event loop on a daemon thread that runs the races of synchronous ``stream`` calls."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="hedging", daemon=True).start()
+    return _loop
+
+
+class _Attempt:
+    """One candidate's stream, read by its own task into the shared ``events`` queue."""
+
+    def __init__(self, name, model, messages, stop, kwargs, events):
+        self.name = name
+        self.started = time.perf_counter()
+        self.leading = []  # empty chunks seen before its first content
+        self.task = asyncio.ensure_future(self._run(model, messages, stop, kwargs, events))
+
+    async def _run(self, model, messages, stop, kwargs, events):
+        try:
+            async for chunk in model.astream(messages, stop=stop, **kwargs):
+                events.put_nowait((self, chunk))
+            events.put_nowait((self, _DONE))
+        except Exception as e:
+            events.put_nowait((self, _Failed(e)))
+
+
+class HedgedChatModel(BaseChatModel):
+    """Streams from whichever of ``candidates`` produces content first.
+
+    ``candidates`` is a list of ``(name, chat_model)`` pairs in order of
+    preference; ``tracker`` reorders them by recent p95 time to first
+    token. The race runs on asyncio tasks, so losers are cancelled the
+    moment there is a winner; synchronous ``stream`` calls run it on a
+    shared background event loop. A failure after the first token is
+    raised as usual: an answer is never switched mid-stream.
+    """
+
+    candidates: list
+    hedge_after: float = HEDGE_AFTER
+    tracker: Any = latency_tracker
+
+    @property
+    def _llm_type(self) -> str:
+        return "hedged"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        return generate_from_stream(self._stream(messages, stop=stop, run_manager=run_manager, **kwargs))
+
+    async def _race(self, messages, stop, kwargs, report):
+        """Yield the winner's chunks; ``report(seconds, **attrs)`` gets the ``llm.hedge`` span."""
+        models = dict(self.candidates)
+        waiting = deque(self.tracker.rank([name for name, _ in self.candidates]))
+        events = asyncio.Queue()
+        running = []
+        start = time.perf_counter()
+
+        def launch():
+            name = waiting.popleft()
+            running.append(_Attempt(name, models[name], messages, stop, kwargs, events))
+            return time.perf_counter() + self.hedge_after
+
+        deadline = launch()
+        winner = None
+        try:
+            while winner is None:
+                timeout = max(0.0, deadline - time.perf_counter()) if waiting else None
+                try:
+                    attempt, item = await asyncio.wait_for(events.get(), timeout)
+                except asyncio.TimeoutError:
+                    deadline = launch()
+                    continue
+                if item is _DONE or isinstance(item, _Failed):
+                    # Failed, or finished without saying anything
+                    self.tracker.record_failure(attempt.name)
+                    running.remove(attempt)
+                    if waiting:
+                        # Fail over straight away instead of waiting out the deadline
+                        deadline = launch()
+                    elif not running:
+                        if isinstance(item, _Failed):
+                            raise item.error
+                        for message in attempt.leading:
+                            yield ChatGenerationChunk(message=message)
+                        return
+                    continue
+                if not _has_content(item):
+                    attempt.leading.append(item)
+                    continue
+                winner = attempt
+                attempt.leading.append(item)
+
+            first_token = time.perf_counter() - winner.started
+            self.tracker.record(winner.name, first_token)
+            for attempt in running:
+                if attempt is winner:
+                    continue
+                attempt.task.cancel()
+                if attempt.started < winner.started:
+                    # Asked first and still silent: its wait so far is a lower bound worth keeping
+                    self.tracker.record(attempt.name, time.perf_counter() - attempt.started)
+            report(time.perf_counter() - start, winner=winner.name, requests=len(running),
+                   first_token=round(first_token, 4))
+
+            for i, message in enumerate(winner.leading):
+                yield ChatGenerationChunk(
+                    message=message,
+                    generation_info={"provider": winner.name} if i == 0 else None,
+                )
+            while True:
+                attempt, item = await events.get()
+                if attempt is not winner:
+                    continue
+                if item is _DONE:
+                    return
+                if isinstance(item, _Failed):
+                    raise item.error
+                yield ChatGenerationChunk(message=item)
+        finally:
+            for attempt in running:
+                attempt.task.cancel()
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        def report(seconds, **attrs):
+            tracer.record("llm.hedge", seconds, **attrs)
+
+        async for chunk in self._race(messages, stop, kwargs, report):
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        # The race runs on the background loop; chunks (and the hedge span, recorded
+        # here so it lands in this caller's tracing context) come back through a queue
+        items = queue.Queue()
+
+        async def pump():
+            try:
+                async for chunk in self._race(messages, stop, kwargs,
+                                              lambda seconds, **attrs: items.put(("llm.hedge", seconds, attrs))):
+                    items.put(chunk)
+                items.put(_DONE)
+            except Exception as e:
+                items.put(_Failed(e))
+
+        future = asyncio.run_coroutine_threadsafe(pump(), _background_loop())
+        try:
+            while (item := items.get()) is not _DONE:
+                if isinstance(item, _Failed):
+                    raise item.error
+                if isinstance(item, tuple):
+                    name, seconds, attrs = item
+                    tracer.record(name, seconds, **attrs)
+                    continue
+                if run_manager:
+                    run_manager.on_llm_new_token(item.text, chunk=item)
+                yield item
+        finally:
+            # Closing the stream early cancels the race, and with it every request
+            future.cancel()
+
+
+def hedge_candidates(provider, model=None, api_key=None):
+    """``(name, provider, model, api_key)`` for the chosen provider, then every other one with a key.
+
+    The other providers use their first listed model and the API key from
+    their environment variable (see ``PROVIDERS``). Providers outside
+    ``PROVIDERS`` (the offline "fake" one) are never hedged.
+    """
+    candidates = [(f"{provider}:{model or 'default'}", provider, model, api_key)]
+    if provider not in KEY_NAMES:
+        return candidates
+    for cfg in PROVIDERS.values():
+        key = os.getenv(KEY_NAMES[cfg["id"]], "")
+        if cfg["id"] != provider and key:
+            candidates.append((f"{cfg['id']}:{cfg['models'][0]}", cfg["id"], cfg["models"][0], key))
+    return candidates
+
+
+def get_hedged_chat_model(provider="openai", model=None, api_key=None, hedge_after=HEDGE_AFTER):
+    """Hedged chat model over ``hedge_candidates``; a plain one if there is nothing to hedge with."""
+    candidates = hedge_candidates(provider, model, api_key)
+    if len(candidates) == 1:
+        return get_chat_model(provider, model, api_key)
+    return cached_client(
+        ("hedged", hedge_after), provider, model, api_key,
+        lambda: HedgedChatModel(
+            candidates=[(name, get_chat_model(p, m, key)) for name, p, m, key in candidates],
+            hedge_after=hedge_after,
+        ),
+    )
@@ -0,0 +1,180 @@
+"""Chat and embedding providers, imported and constructed on first use.
+
+Each provider registers factories that import its SDK inside the function,
+so a process only pays for the SDKs it actually uses. Constructed clients
+are cached per (provider, model, API key hash) and reused by every chain,
+summarizer and request. Adding a provider means adding its sidebar entry
+to ``PROVIDERS`` and registering a chat (and optionally an embedding)
+factory below.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+# Sidebar entries: display name -> settings. "embeddings" is the provider
+# used to embed documents when this one answers.
+PROVIDERS = {
+    "OpenAI": {
+        "icon": "🟢",
+        "models": ["gpt-4o-mini", "gpt-4o", "gpt-4.1-mini", "gpt-4.1-nano"],
+        "key_name": "OPENAI_API_KEY",
+        "id": "openai",
+        "embeddings": "openai",
+    },
+    "Google Gemini": {
+        "icon": "🔵",
+        "models": ["gemini-2.0-flash", "gemini-2.5-flash", "gemini-2.5-pro"],
+        "key_name": "GOOGLE_API_KEY",
+        "id": "google",
+        "embeddings": "google",
+    },
+    "Anthropic": {
+        "icon": "🟠",
+        "models": ["claude-sonnet-4-20250514", "claude-3-5-haiku-20241022"],
+        "key_name": "ANTHROPIC_API_KEY",
+        "id": "anthropic",
+        # Anthropic doesn't have its own embedding model
+        "embeddings": "openai",
+    },
+}
+
+KEY_NAMES = {cfg["id"]: cfg["key_name"] for cfg in PROVIDERS.values()}
+
+# Clients kept alive at once; old API keys and models fall out first
+MAX_CLIENTS = 32
+# Mark the stable prompt prefix for providers that need explicit cache breakpoints (Anthropic)
+PROMPT_CACHE = os.getenv("DOCMIND_PROMPT_CACHE", "1") == "1"
+
+_chat_factories = {}
+_embedding_factories = {}
+_clients = OrderedDict()
+_lock = threading.Lock()
+
+
+def register_chat_model(provider):
+    """Decorator registering ``factory(model, api_key)`` as the chat model for ``provider``."""
+    def decorator(factory):
+        _chat_factories[provider] = factory
+        return factory
+    return decorator
+
+
+def register_embeddings(provider):
+    """Decorator registering ``factory(api_key)`` -> ``(embeddings, model_id)`` for ``provider``."""
+    def decorator(factory):
+        _embedding_factories[provider] = factory
+        return factory
+    return decorator
+
+
+def _key_hash(api_key):
+    # Keys are never kept in the cache key itself
+    return hashlib.sha256((api_key or "").encode()).hexdigest()[:16]
+
+
+def cached_client(kind, provider, model, api_key, build):
+    """Return the cached client for these settings, calling ``build()`` on a miss."""
+    key = (kind, provider, model, _key_hash(api_key))
+    with _lock:
+        if key in _clients:
+            _clients.move_to_end(key)
+            return _clients[key]
+    # Built outside the lock: the first use of a provider imports its SDK
+    client = build()
+    with _lock:
+        client = _clients.setdefault(key, client)
+        while len(_clients) > MAX_CLIENTS:
+            _clients.popitem(last=False)
+    return client
+
+
+def get_chat_model(provider="openai", model=None, api_key=None):
+    """Chat model for ``provider``. Unknown providers fall back to OpenAI."""
+    if provider not in _chat_factories:
+        provider = "openai"
+    factory = _chat_factories[provider]
+    return cached_client("chat", provider, model, api_key, lambda: factory(model, api_key))
+
+
+def get_embedding_model(provider="openai", api_key=None):
+    """``(embeddings, model_id)`` for ``provider``. Unknown providers fall back to OpenAI."""
+    if provider not in _embedding_factories:
+        provider = "openai"
+    factory = _embedding_factories[provider]
+    return cached_client("embeddings", provider, None, api_key, lambda: factory(api_key))
+
+
+# ─── Chat models ─────────────────────────────────────────────────────────────
+@register_chat_model("openai")
+def _openai_chat(model, api_key):
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(
+        model=model or "gpt-4o-mini",
+        api_key=api_key,
+        temperature=0.2,
+        streaming=True,
+        stream_usage=True,
+    )
+
+
+@register_chat_model("google")
+def _google_chat(model, api_key):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(
+        model=model or "gemini-2.0-flash",
+        google_api_key=api_key,
+        temperature=0.2,
+        convert_system_message_to_human=True,
+    )
+
+
+@register_chat_model("anthropic")
+def _anthropic_chat(model, api_key):
+    if PROMPT_CACHE:
+        from providers.anthropic_cache import PrefixCachedChatAnthropic as ChatAnthropic
+    else:
+        from langchain_anthropic import ChatAnthropic
+    return ChatAnthropic(
+        model=model or "claude-sonnet-4-20250514",
+        api_key=api_key,
+        temperature=0.2,
+    )
+
+
+@register_chat_model("fake")
+def _fake_chat(model, api_key):
+    # Offline model for tests, benchmarks and the headless service
+    from chains.fake_llm import FakeStreamingChatModel
+    return FakeStreamingChatModel()
+
+
+# ─── Embeddings ──────────────────────────────────────────────────────────────
+@register_embeddings("openai")
+def _openai_embeddings(api_key):
+    from langchain_openai import OpenAIEmbeddings
+    embeddings = OpenAIEmbeddings(api_key=api_key)
+    return embeddings, f"openai:{embeddings.model}"
+
+
+@register_embeddings("google")
+def _google_embeddings(api_key):
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=api_key)
+    return embeddings, f"google:{embeddings.model}"
+
+
+@register_embeddings("local")
+def _local_embeddings(api_key):
+    # Runs on this machine: no API key, no network (see embeddings.local_embeddings)
+    from embeddings.local_embeddings import get_local_embeddings
+    return get_local_embeddings()
+
+
+@register_embeddings("fake")
+def _fake_embeddings(api_key):
+    # Offline embeddings for tests, benchmarks and the headless service
+    from embeddings.fake_embeddings import FakeEmbeddings
+    embeddings = FakeEmbeddings()
+    return embeddings, f"fake:{embeddings.model}"
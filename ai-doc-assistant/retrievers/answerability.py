@@ -0,0 +1,163 @@
+"""Decide from retrieval scores alone whether the documents can answer a question.
+
+Questions the documents say nothing about still cost a full generation
+over four chunks before the model replies that the answer isn't there.
+``AnswerabilityGate`` looks at what retrieval already computed, the best
+dense relevance score and how much of the question's vocabulary occurs in
+the corpus, and lets ``build_chain`` and the app answer those questions
+with ``NOT_IN_DOCUMENT`` (or go straight to the web) in milliseconds.
+
+The relevance threshold depends on the embedding model and the corpus, so
+it is calibrated per corpus (``calibrate_threshold``); the gate is
+conservative and only refuses when both signals are weak.
+"""
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from retrievers.hybrid_retriever import best_relevance_score
+from vectorstore.bm25_index import tokenize
+
+
+ANSWERABILITY_GATE = os.getenv("DOCMIND_ANSWERABILITY_GATE", "1") == "1"
+# Share of the question's content words found in the corpus at or above
+# which it is answered whatever its dense score
+MIN_TERM_COVERAGE = float(os.getenv("DOCMIND_MIN_TERM_COVERAGE", "0.5"))
+# Where the threshold sits between the off-topic p90 and on-topic p10 scores;
+# nearer the off-topic end, since questions cut from chunks score higher than
+# real ones
+CALIBRATION_POSITION = 0.25
+CALIBRATION_SAMPLES = 16
+# Probe embeddings requested at once while calibrating
+CALIBRATION_WORKERS = 8
+
+# Words that say nothing about whether a question is on topic; the second set
+# is the wording of summary and overview questions, which are about the
+# documents as a whole and leave no content words to check
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be been before being below between
+both but by can could did do does doing down during each few for from further had has have
+having he her here hers him his how i if in into is it its itself just me more most my no nor
+not now of off on once only or other our out over own please same she should so some such tell
+than that the their them then there these they this those through to too under until up very
+was we were what when where which while who whom why will with would you your
+""".split()) | frozenset("""
+article brief briefly chapter chapters content contents cover covered covers describe
+describes document documents explain file files give highlight highlights idea ideas important
+key list main outline overall overview page pages paper pdf point points section sections show
+summarise summarize summary takeaway takeaways text topic topics uploaded
+""".split())
+
+NOT_IN_DOCUMENT = "I cannot find anything about this in the uploaded documents."
+
+# Questions no uploaded document should answer; their scores are the off-topic baseline
+OFF_TOPIC_PROBES = [
+    "What's the weather going to be like tomorrow?",
+    "Who won the last football world cup?",
+    "How do I bake sourdough bread at home?",
+    "Tell me a joke about cats.",
+    "What is the capital city of Australia?",
+    "Recommend a good movie to watch tonight.",
+    "How tall is Mount Everest?",
+    "Write a short poem about the ocean.",
+    "What time is it in Tokyo right now?",
+    "How do I reset my wifi router password?",
+    "Who painted the Mona Lisa?",
+    "What are some healthy breakfast ideas?",
+]
+
+
+def term_coverage(question, bm25=None, docs=()):
+    """Share of ``question``'s content words (not ``STOPWORDS``) that occur in the corpus.
+
+    Without a ``bm25`` index the retrieved ``docs`` stand in for the corpus.
+    A question with no content words ("What are the main points?") is
+    fully covered, so the gate never refuses it.
+    """
+    terms = {term for term in tokenize(question) if term not in STOPWORDS}
+    if not terms:
+        return 1.0
+    if bm25 is not None and len(bm25):
+        return sum(term in bm25.postings for term in terms) / len(terms)
+    seen = set()
+    for doc in docs:
+        seen.update(tokenize(doc.page_content))
+    return len(terms & seen) / len(terms)
+
+
+def _pseudo_questions(vectorstore, count):
+    # A dozen words from the middle of chunks spread over the index
+    ids = list(vectorstore.index_to_docstore_id.values())
+    questions = []
+    for docstore_id in ids[::max(1, len(ids) // count)][:count]:
+        words = vectorstore.docstore.search(docstore_id).page_content.split()
+        middle = len(words) // 2
+        questions.append(" ".join(words[max(0, middle - 6):middle + 6]))
+    return [q for q in questions if q]
+
+
+def calibrate_threshold(vectorstore, embeddings, probes=OFF_TOPIC_PROBES, samples=CALIBRATION_SAMPLES,
+                        position=CALIBRATION_POSITION):
+    """Dense relevance below which a question is off-topic for ``vectorstore``, or None.
+
+    Embeds ``probes`` and ``samples`` pseudo-questions cut from the indexed
+    chunks with ``embeddings.embed_query``, as real questions are (query and
+    document embeddings live in different spaces for asymmetric models),
+    takes the best relevance score each gets, and puts the threshold
+    ``position`` of the way from the off-topic p90 to the on-topic p10
+    (never above the latter).
+    """
+    if vectorstore is None or not vectorstore.index.ntotal:
+        return None
+    questions = _pseudo_questions(vectorstore, samples)
+    with ThreadPoolExecutor(max_workers=CALIBRATION_WORKERS) as pool:
+        futures = [
+            pool.submit(contextvars.copy_context().run, embeddings.embed_query, question)
+            for question in list(probes) + questions
+        ]
+        vectors = [future.result() for future in futures]
+    relevance = vectorstore._select_relevance_score_fn()
+    best = []
+    for vector in vectors:
+        hits = vectorstore.similarity_search_with_score_by_vector(vector, k=1)
+        best.append(relevance(hits[0][1]) if hits else 0.0)
+    off_topic, on_topic = np.asarray(best[:len(probes)]), np.asarray(best[len(probes):])
+    if not len(off_topic) or not len(on_topic):
+        return None
+    low, high = float(np.quantile(off_topic, 0.9)), float(np.quantile(on_topic, 0.1))
+    return min(low + position * (high - low), high)
+
+
+class AnswerabilityGate:
+    """Refuses questions whose retrieval scores say the documents can't answer them.
+
+    A question is refused when its best dense relevance is below
+    ``threshold`` and less than ``min_coverage`` of its content words
+    occur in the corpus (see ``term_coverage``). Confident lexical matches
+    always pass, and with no ``threshold`` nothing is refused.
+    """
+
+    def __init__(self, threshold=None, bm25=None, min_coverage=MIN_TERM_COVERAGE):
+        self.threshold = threshold
+        self.bm25 = bm25
+        self.min_coverage = min_coverage
+
+    def _weak(self, relevance):
+        return self.threshold is not None and (relevance is None or relevance < self.threshold)
+
+    def weak(self, docs):
+        """Whether the best dense relevance of ``docs`` is below the calibrated threshold."""
+        return self._weak(best_relevance_score(docs))
+
+    def check(self, question, docs):
+        """``{"answerable", "relevance", "coverage"}`` for ``question`` and its retrieved ``docs``."""
+        relevance = best_relevance_score(docs)
+        coverage = term_coverage(question, self.bm25, docs)
+        weak = self._weak(relevance)
+        answerable = bool(docs) and (not weak or coverage >= self.min_coverage)
+        return {"answerable": answerable, "relevance": relevance, "coverage": round(coverage, 3)}
+
+    def answerable(self, question, docs):
+        return self.check(question, docs)["answerable"]
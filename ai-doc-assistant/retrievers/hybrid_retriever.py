@@ -0,0 +1,169 @@
+from typing import Any, Optional
+
+import numpy as np
+from langchain_core.retrievers import BaseRetriever
+from pydantic import PrivateAttr
+
+from monitoring.tracing import tracer
+from retrievers.reranker import MMR, MMR_LAMBDA, RERANK, mmr_select, rerank_scores
+from vectorstore.bm25_index import tokenize
+from vectorstore.index_engine import vectors_for
+
+
+def _is_identifier(token):
+    # Part numbers, clause ids, versions: anything mixing digits into a token
+    return any(c.isdigit() for c in token) and len(token) > 1
+
+
+def _with_scores(doc, relevance, source):
+    # Copy so the Documents held by the docstore are never mutated
+    return doc.model_copy(update={
+        "metadata": {
+            **doc.metadata,
+            "relevance_score": None if relevance is None else float(relevance),
+            "retrieval": source,
+        },
+    })
+
+
+def best_relevance_score(docs):
+    """Highest dense relevance score among ``docs``, or None if none was scored.
+
+    Returns 1.0 when the docs came from a confident lexical-only match.
+    """
+    if any(doc.metadata.get("retrieval") == "lexical" for doc in docs):
+        return 1.0
+    scores = [doc.metadata["relevance_score"] for doc in docs if doc.metadata.get("relevance_score") is not None]
+    return max(scores) if scores else None
+
+
+class HybridRetriever(BaseRetriever):
+    """BM25 + dense retrieval fused with reciprocal rank fusion.
+
+    Keyword-heavy queries (short queries built around identifiers such as
+    part numbers or clause ids) that the lexical index answers confidently
+    are served from BM25 alone, which skips the query-embedding API call.
+    Without a ``bm25`` index this is a plain dense retriever. With
+    ``doc_ids`` the dense search over-fetches ``filter_fetch_factor`` times
+    what it needs and widens only if the filter leaves too few.
+
+    The best ``fetch_k`` candidates then go through a post-retrieval stage
+    that works on the vectors already stored in the index (nothing is
+    re-embedded): an optional ``rerank`` by exact similarity and BM25 (see
+    ``retrievers.reranker``), then, with ``mmr``, MMR with ``lambda_mult`` so
+    overlapping near-duplicate chunks don't take up several of the ``k``
+    slots.
+
+    Returned docs carry ``relevance_score`` (dense similarity in [0, 1], or
+    None for lexical-only hits) and ``retrieval`` metadata. The query
+    embedding of the last retrieval stays available from ``query_vector``
+    so callers (the answer cache) don't embed the question again.
+    """
+
+    vectorstore: Any
+    bm25: Any = None
+    k: int = 4
+    fetch_k: int = 40
+    rrf_k: int = 60
+    doc_ids: Optional[list] = None
+    # Candidates searched per result with a doc_ids filter, widened by this factor until k are found
+    filter_fetch_factor: int = 8
+    max_keyword_query_tokens: int = 8
+    mmr: bool = MMR
+    lambda_mult: float = MMR_LAMBDA
+    rerank: bool = RERANK
+    _last_query: tuple = PrivateAttr(default=(None, None))
+
+    def query_vector(self, query):
+        """Embedding the last retrieval computed for ``query``; None after a lexical-only match."""
+        last_query, vector = self._last_query
+        return vector if last_query == query else None
+
+    def _lexical_only(self, query, lexical):
+        tokens = tokenize(query)
+        identifiers = [t for t in tokens if _is_identifier(t)]
+        if not identifiers or len(tokens) > self.max_keyword_query_tokens or not lexical:
+            return False
+        # The top hit must contain every identifier the user asked about
+        top_tokens = set(tokenize(lexical[0][1].page_content))
+        return all(t in top_tokens for t in identifiers)
+
+    def _dense(self, query_vector, k):
+        search = self.vectorstore.similarity_search_with_score_by_vector
+        if self.doc_ids is None:
+            hits = search(query_vector, k=k)
+        else:
+            # Filtering happens after the vector search: over-fetch, and widen
+            # the search only when the selected documents didn't fill k
+            where = {"doc_id": {"$in": list(self.doc_ids)}}
+            total = self.vectorstore.index.ntotal
+            fetch = k * self.filter_fetch_factor
+            while True:
+                hits = search(query_vector, k=k, filter=where, fetch_k=min(fetch, total))
+                if len(hits) >= k or fetch >= total:
+                    break
+                fetch *= self.filter_fetch_factor
+        relevance = self.vectorstore._select_relevance_score_fn()
+        return [(doc, relevance(score)) for doc, score in hits]
+
+    def _select(self, query_vector, ids, relevance, bm25_scores=None):
+        """Positions in ``ids`` of the ``k`` chunks to return, best first."""
+        relevance = np.asarray(relevance, dtype=np.float32)
+        if (self.mmr or self.rerank) and len(ids) > 1:
+            with tracer.span("retrieve.select", candidates=len(ids)):
+                vectors = vectors_for(self.vectorstore, ids)
+                if vectors is not None:
+                    if self.rerank:
+                        lexical = None
+                        if bm25_scores is not None:
+                            positions = self.bm25.positions
+                            lexical = [bm25_scores[positions[i]] if i in positions else 0.0 for i in ids]
+                        relevance = rerank_scores(query_vector, vectors, lexical)
+                    if self.mmr:
+                        return mmr_select(relevance, vectors, self.k, self.lambda_mult)
+        return [int(i) for i in np.argsort(-relevance, kind="stable")[:self.k]]
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        with tracer.span("retrieve") as span:
+            docs = self._retrieve(query)
+            span["chunks"] = len(docs)
+            span["mode"] = docs[0].metadata["retrieval"] if docs else None
+        return docs
+
+    def _retrieve(self, query):
+        self._last_query = (query, None)
+        bm25_scores, lexical = None, []
+        if self.bm25 is not None:
+            bm25_scores = self.bm25.scores(query)
+            lexical = self.bm25.top(bm25_scores, self.fetch_k, doc_ids=self.doc_ids)
+        if lexical and self._lexical_only(query, lexical):
+            ids = [doc_id for doc_id, _, _ in lexical]
+            docs = {doc_id: doc for doc_id, doc, _ in lexical}
+            top = lexical[0][2]
+            picked = self._select(None, ids, [score / top for _, _, score in lexical], bm25_scores)
+            return [_with_scores(docs[ids[i]], None, "lexical") for i in picked]
+
+        query_vector = self.vectorstore._embed_query(query)
+        self._last_query = (query, query_vector)
+        # Plain dense retrieval needs no candidates beyond the k it returns
+        plain = self.bm25 is None and not (self.mmr or self.rerank)
+        dense = self._dense(query_vector, self.k if plain else self.fetch_k)
+        relevance = {doc.id: score for doc, score in dense}
+        docs = {doc.id: doc for doc, _ in dense}
+        if self.bm25 is None:
+            ids = list(relevance)
+            picked = self._select(query_vector, ids, [relevance[i] for i in ids])
+            return [_with_scores(docs[ids[i]], relevance[ids[i]], "dense") for i in picked]
+
+        fused = {}
+        for rank, (doc_id, doc, _) in enumerate(lexical):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+            docs.setdefault(doc_id, doc)
+        for rank, (doc, _) in enumerate(dense):
+            fused[doc.id] = fused.get(doc.id, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+
+        ids = sorted(fused, key=fused.get, reverse=True)
+        # Ranks carry no absolute meaning, so give MMR fused scores scaled to the best one
+        top = fused[ids[0]] if ids else 1.0
+        picked = self._select(query_vector, ids, [fused[i] / top for i in ids], bm25_scores)
+        return [_with_scores(docs[ids[i]], relevance.get(ids[i]), "hybrid") for i in picked]
@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+
+
+# Pick chunks by MMR; off by default, as it costs dense-only retrieval recall
+MMR = os.getenv("DOCMIND_MMR", "0") == "1"
+# Trade-off between relevance (1.0) and diversity (0.0) when picking chunks
+MMR_LAMBDA = float(os.getenv("DOCMIND_MMR_LAMBDA", "0.5"))
+# Rescore candidates with exact vector similarity and BM25 before MMR
+RERANK = os.getenv("DOCMIND_RERANK", "0") == "1"
+# Share of the rerank score that comes from BM25 when a lexical index exists
+RERANK_LEXICAL_WEIGHT = 0.3
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def unit_range(scores):
+    """Scale ``scores`` linearly onto [0, 1] (all ones if they are equal)."""
+    scores = np.asarray(scores, dtype=np.float32)
+    low, high = scores.min(), scores.max()
+    return (scores - low) / (high - low) if high > low else np.ones_like(scores)
+
+
+def rerank_scores(query_vector, vectors, lexical=None, lexical_weight=RERANK_LEXICAL_WEIGHT):
+    """Score candidates by exact cosine similarity, blended with BM25 if given.
+
+    ``vectors`` are the candidates' stored vectors, so the cosine is exact
+    even when the index search was approximate. ``lexical`` holds their
+    BM25 scores; both signals are scaled to [0, 1] before blending. Without
+    a ``query_vector`` only the lexical scores are used.
+    """
+    if query_vector is None:
+        return unit_range(lexical)
+    dense = _normalize(vectors) @ _normalize(query_vector)
+    if lexical is None:
+        return dense
+    return (1 - lexical_weight) * unit_range(dense) + lexical_weight * unit_range(lexical)
+
+
+def mmr_select(relevance, vectors, k, lambda_mult=MMR_LAMBDA):
+    """Indices of ``k`` candidates picked by maximal marginal relevance.
+
+    Each pick maximises ``lambda_mult * relevance - (1 - lambda_mult) *
+    (max cosine similarity to the chunks already picked)``, so a chunk that
+    mostly repeats an earlier pick (overlapping neighbours, repeated
+    passages) loses to the next distinct one. ``relevance`` should be
+    roughly in [0, 1]. Costs one matrix-vector product per pick.
+    """
+    relevance = np.asarray(relevance, dtype=np.float32)
+    count = len(relevance)
+    if count <= 1 or k <= 1:
+        return [int(i) for i in np.argsort(-relevance, kind="stable")[:k]]
+    vectors = _normalize(vectors)
+    selected = [int(np.argmax(relevance))]
+    redundancy = vectors @ vectors[selected[0]]
+    for _ in range(min(k, count) - 1):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        np.maximum(redundancy, vectors @ vectors[best], out=redundancy)
+    return selected
@@ -0,0 +1,259 @@
+"""Headless DocMind service: ingest PDFs and stream answers over SSE.
+
+Run with::
+
+    uvicorn server:app --host 0.0.0.0 --port 8000
+
+Endpoints:
+
+    GET    /health
+    GET    /documents
+    POST   /documents            PDF as the raw body (?filename=...) or multipart field "file"
+    DELETE /documents/{doc_id}
+    POST   /ask                  JSON {question, provider, model, doc_ids, chat_history}
+                                 -> text/event-stream of "token" events, then "done"
+                                 (sources, token usage with prompt cache hits, and
+                                 "answerable": false if the documents can't answer it)
+    GET    /metrics              stage latencies in the Prometheus text format
+                                 (needs DOCMIND_TRACING=1)
+
+The provider API key comes from the ``X-API-Key`` header or the usual
+environment variable. Set ``DOCMIND_EMBED_PROVIDER=fake`` and ask with
+``"provider": "fake"`` to run entirely offline.
+"""
+import asyncio
+import json
+import os
+import threading
+
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from chains.conversational_chain import build_chain, build_retriever
+from embeddings.embedding_model import get_embeddings
+from loaders.document_loader import COPY_CHUNK_BYTES, iter_pdf_pages, temporary_pdf
+from memory.chat_memory import RollingHistory
+from monitoring.tracing import LLMTracingHandler, tracer
+from processing.ingest_pipeline import ingest
+from providers.registry import KEY_NAMES
+from retrievers.answerability import ANSWERABILITY_GATE
+from vectorstore.corpus_index import CorpusIndex
+from vectorstore.index_registry import IndexRegistry, file_hash
+
+load_dotenv()
+
+EMBED_PROVIDER = os.getenv("DOCMIND_EMBED_PROVIDER", "openai")
+# Concurrent generations allowed per LLM provider; extra requests wait their turn
+MAX_CONCURRENCY = int(os.getenv("DOCMIND_MAX_CONCURRENCY", "8"))
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class DocService:
+    """Corpus, index registry and per-provider limits shared by all requests."""
+
+    def __init__(self, embed_provider=EMBED_PROVIDER, registry=None, max_concurrency=MAX_CONCURRENCY):
+        self.embeddings = get_embeddings(
+            provider=embed_provider,
+            api_key=os.getenv(KEY_NAMES.get(embed_provider, ""), ""),
+        )
+        self.registry = registry or IndexRegistry()
+        self.corpus = CorpusIndex(self.embeddings)
+        self.max_concurrency = max_concurrency
+        self._limits = {}
+        # FAISS isn't safe to search while it's being appended to, so changes
+        # go to a copy of the corpus that replaces it under ``_lock`` (see
+        # ``_update``); ``_write_lock`` keeps one change from losing another
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def limit(self, provider):
+        if provider not in self._limits:
+            self._limits[provider] = asyncio.Semaphore(self.max_concurrency)
+        return self._limits[provider]
+
+    def _update(self, change):
+        """Apply ``change(corpus)`` to a copy of the corpus, then swap the copy in."""
+        with self._write_lock:
+            corpus = self.corpus.copy()
+            result = change(corpus)
+            corpus.bm25  # built once here rather than by the first searches
+            with self._lock:
+                self.corpus = corpus
+        return result
+
+    def ingest_file(self, file_path, name):
+        doc_id = file_hash(file_path)
+
+        def build():
+            vectorstore, stats = ingest(iter_pdf_pages(file_path), self.embeddings)
+            return vectorstore, {"pages": stats["pages"], "chunks": stats["chunks"]}
+
+        vectorstore, info = self.registry.get_or_create(
+            doc_id, self.embeddings.model_id, self.embeddings, build
+        )
+        self._update(lambda corpus: corpus.add_document(doc_id, vectorstore, name=name, info=info))
+        return {"doc_id": doc_id, "name": name, **info}
+
+    def remove(self, doc_id):
+        def change(corpus):
+            found = doc_id in corpus
+            corpus.remove_document(doc_id)
+            return found
+
+        return self._update(change)
+
+    def documents(self):
+        return [
+            {"doc_id": doc_id, **{k: v for k, v in entry.items() if k != "chunk_ids"}}
+            for doc_id, entry in self.corpus.documents.items()
+        ]
+
+    def retrieve(self, question, doc_ids=None):
+        """``(retriever, docs, gate)``; ``gate`` is the corpus's answerability gate, if enabled.
+
+        Only taking the current corpus holds the lock: it is never changed
+        once swapped in, so searching it (query embedding included) and
+        calibrating its gate run alongside other requests.
+        """
+        with self._lock:
+            corpus = self.corpus
+        retriever = build_retriever(corpus.vectorstore, doc_ids=doc_ids, bm25=corpus.bm25)
+        gate = corpus.answerability(self.embeddings) if ANSWERABILITY_GATE else None
+        return retriever, retriever.invoke(question), gate
+
+
+service = None
+
+
+def get_service():
+    global service
+    if service is None:
+        service = DocService()
+    return service
+
+
+async def health(request):
+    return JSONResponse({"status": "ok"})
+
+
+async def metrics(request):
+    return PlainTextResponse(tracer.prometheus(), media_type="text/plain; version=0.0.4")
+
+
+async def list_documents(request):
+    return JSONResponse({"documents": get_service().documents()})
+
+
+async def add_document(request):
+    name = request.query_params.get("filename", "document.pdf")
+    # The temporary file is removed however this request ends
+    with temporary_pdf() as file_path:
+        with open(file_path, "wb") as tmp:
+            if request.headers.get("content-type", "").startswith("multipart/"):
+                # Closing the form deletes the parser's own spooled copy
+                async with request.form() as form:
+                    upload = form.get("file")
+                    if upload is None:
+                        return JSONResponse({"error": "missing 'file' field"}, status_code=400)
+                    name = upload.filename or name
+                    while block := await upload.read(COPY_CHUNK_BYTES):
+                        tmp.write(block)
+            else:
+                # Copy the body to disk as it arrives instead of buffering it
+                async for block in request.stream():
+                    tmp.write(block)
+
+        try:
+            result = await run_in_threadpool(get_service().ingest_file, file_path, name)
+        except Exception as e:
+            return JSONResponse({"error": str(e)}, status_code=422)
+    return JSONResponse(result, status_code=201)
+
+
+async def remove_document(request):
+    if not await run_in_threadpool(get_service().remove, request.path_params["doc_id"]):
+        return JSONResponse({"error": "unknown document"}, status_code=404)
+    return JSONResponse({"removed": request.path_params["doc_id"]})
+
+
+async def ask(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        return JSONResponse({"error": "body must be JSON"}, status_code=400)
+    if not isinstance(body, dict):
+        return JSONResponse({"error": "body must be a JSON object"}, status_code=400)
+    question = body.get("question") or ""
+    if not isinstance(question, str):
+        return JSONResponse({"error": "'question' must be a string"}, status_code=400)
+    question = question.strip()
+    if not question:
+        return JSONResponse({"error": "missing 'question'"}, status_code=400)
+
+    chat_history = body.get("chat_history") or []
+    if not isinstance(chat_history, list) or not all(
+        isinstance(m, dict) and isinstance(m.get("role"), str) and isinstance(m.get("content"), str)
+        for m in chat_history
+    ):
+        return JSONResponse({"error": "'chat_history' must be a list of {role, content} strings"}, status_code=400)
+
+    svc = get_service()
+    if not len(svc.corpus):
+        return JSONResponse({"error": "no documents ingested"}, status_code=409)
+
+    provider = body.get("provider", "openai")
+    api_key = request.headers.get("x-api-key") or os.getenv(KEY_NAMES.get(provider, ""), "")
+    summary, chat_history = RollingHistory(provider=provider).window(chat_history)
+
+    try:
+        retriever, docs, gate = await run_in_threadpool(svc.retrieve, question, body.get("doc_ids"))
+        chain = build_chain(
+            retriever.vectorstore,
+            provider=provider,
+            model=body.get("model"),
+            api_key=api_key,
+            retriever=retriever,
+            gate=gate,
+        )
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    async def events():
+        handler = LLMTracingHandler(provider, body.get("model"))
+        async with svc.limit(provider):
+            try:
+                async for token in chain.astream({
+                    "question": question,
+                    "chat_history": chat_history,
+                    "history_summary": summary,
+                    "docs": docs,
+                }, config={"callbacks": [handler]}):
+                    yield _sse("token", {"text": token})
+            except Exception as e:
+                yield _sse("error", {"message": str(e)})
+                return
+        sources = [
+            {"doc_id": d.metadata.get("doc_id"), "page": d.metadata.get("page"),
+             "relevance_score": d.metadata.get("relevance_score")}
+            for d in docs
+        ]
+        answerable = gate.answerable(question, docs) if gate is not None else True
+        yield _sse("done", {"sources": sources, "usage": handler.usage, "answerable": answerable})
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+app = Starlette(routes=[
+    Route("/health", health),
+    Route("/metrics", metrics),
+    Route("/documents", list_documents, methods=["GET"]),
+    Route("/documents", add_document, methods=["POST"]),
+    Route("/documents/{doc_id}", remove_document, methods=["DELETE"]),
+    Route("/ask", ask, methods=["POST"]),
+])
@@ -1,21 +1,83 @@
-from duckduckgo_search import DDGS
+import contextvars
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
+from monitoring.tracing import tracer
+
+
+SEARCH_CACHE_TTL = 15 * 60
+SEARCH_CACHE_SIZE = 256
+
+# Phrases the LLM uses when the document doesn't contain the answer
+NOT_FOUND_PHRASES = ["not in the context", "not mentioned", "i don't have", "no information", "cannot find"]
+
+_cache = OrderedDict()  # (normalized query, max_results) -> (output, expires_at)
+_cache_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="web-search")
+
+
+def ddgs_search(query, max_results):
+    """Default search backend: DuckDuckGo text results as dicts with title/body/href."""
+    # Imported on first search; most sessions never leave the document
+    from duckduckgo_search import DDGS
+    with DDGS() as ddgs:
+        return ddgs.text(query, max_results=max_results)
+
+
+def _normalize(query):
+    return " ".join(re.findall(r"\w+", query.lower()))
 
-def search_web(query: str, max_results: int = 3) -> str:
-    """Search the web using DuckDuckGo and return formatted results."""
-    try:
-        with DDGS() as ddgs:
-            results = ddgs.text(query, max_results=max_results)
 
-            if not results:
-                return "No web results found."
+def answer_not_found(answer):
+    """Whether the LLM said the document doesn't answer the question."""
+    answer = answer.lower()
+    return any(phrase in answer for phrase in NOT_FOUND_PHRASES)
 
+
+def search_web(query: str, max_results: int = 3, backend=None) -> str:
+    """Search the web using DuckDuckGo and return formatted results.
+
+    Results are cached per normalized query for ``SEARCH_CACHE_TTL``
+    seconds. ``backend(query, max_results)`` replaces DuckDuckGo, e.g. with
+    a local stub in tests.
+    """
+    key = (_normalize(query), max_results)
+    now = time.time()
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[1] > now:
+            _cache.move_to_end(key)
+            return cached[0]
+
+    try:
+        with tracer.span("web_search") as span:
+            results = (backend or ddgs_search)(query, max_results)
+            span["results"] = len(results or [])
+
+        if not results:
+            output = "No web results found."
+        else:
             output = ""
             for r in results:
                 output += f"**{r['title']}**\n"
                 output += f"{r['body']}\n"
                 output += f"[Source]({r['href']})\n\n"
-
-            return output
     except Exception as e:
+        # Failures are not cached so the next question retries
         return f"Web search failed: {str(e)}"
+
+    with _cache_lock:
+        _cache[key] = (output, now + SEARCH_CACHE_TTL)
+        _cache.move_to_end(key)
+        while len(_cache) > SEARCH_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return output
+
+
+def prefetch_web(query: str, max_results: int = 3, backend=None):
+    """Start ``search_web`` in the background and return its Future."""
+    # Run in the caller's context so the span follows its tracing setting
+    return _executor.submit(contextvars.copy_context().run, search_web, query, max_results, backend)
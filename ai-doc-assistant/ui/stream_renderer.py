@@ -0,0 +1,79 @@
+import time
+
+
+# Shortest time between two frames of a streamed answer
+MIN_FRAME_INTERVAL = 0.05
+# Characters after which the interval has doubled: long answers re-render less often
+INTERVAL_GROWTH_CHARS = 1500
+# Pending characters that force a frame even if the interval hasn't passed:
+# at least MAX_PENDING_CHARS, or PENDING_GROWTH of what is already rendered,
+# so forced frames grow geometrically and total rendering stays linear
+MAX_PENDING_CHARS = 400
+PENDING_GROWTH = 0.25
+
+
+class StreamRenderer:
+    """Renders a streamed answer in frames instead of once per token.
+
+    Every call to ``render`` re-sends the whole answer so far, so rendering
+    each token is quadratic in the answer length. Tokens are buffered in a
+    list and joined only when a frame is drawn; a frame is drawn when the
+    frame interval has passed or enough text is pending. Both the interval
+    and the pending limit grow with the answer (the limit by ``growth`` of
+    its length), which keeps the total characters rendered linear while
+    short answers still appear token by token.
+    """
+
+    def __init__(self, render, cursor="▌", min_interval=MIN_FRAME_INTERVAL,
+                 growth_chars=INTERVAL_GROWTH_CHARS, max_pending=MAX_PENDING_CHARS, growth=PENDING_GROWTH):
+        self.render = render
+        self.cursor = cursor
+        self.min_interval = min_interval
+        self.growth_chars = growth_chars
+        self.max_pending = max_pending
+        self.growth = growth
+        self.frames = 0
+        self.rendered_chars = 0
+        self._parts = []
+        self._length = 0
+        self._pending = 0
+        self._last_frame = 0.0
+
+    @property
+    def text(self):
+        if len(self._parts) > 1:
+            self._parts = ["".join(self._parts)]
+        return self._parts[0] if self._parts else ""
+
+    def _interval(self):
+        return self.min_interval * (1 + self._length / self.growth_chars)
+
+    def _draw(self, suffix=""):
+        text = self.text
+        self.render(text + suffix)
+        self.frames += 1
+        self.rendered_chars += len(text)
+        self._pending = 0
+        self._last_frame = time.monotonic()
+
+    def write(self, chunk):
+        """Add a streamed piece; draws a frame if one is due."""
+        if not chunk:
+            return
+        self._parts.append(chunk)
+        self._length += len(chunk)
+        self._pending += len(chunk)
+        if (self._pending >= max(self.max_pending, self.growth * (self._length - self._pending))
+                or time.monotonic() - self._last_frame >= self._interval()):
+            self._draw(self.cursor)
+
+    def consume(self, stream):
+        """Render every piece of ``stream`` and return the full text."""
+        for chunk in stream:
+            self.write(chunk)
+        return self.close()
+
+    def close(self):
+        """Draw the final frame without the cursor and return the full text."""
+        self._draw()
+        return self.text
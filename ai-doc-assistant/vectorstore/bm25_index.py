@@ -0,0 +1,116 @@
+import math
+import re
+from array import array
+from collections import Counter
+
+import numpy as np
+
+
+# Keeps identifiers like "A-1234", "7.3.2" or "iso_9001" as single tokens
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """Compact in-process BM25 inverted index over chunks.
+
+    Postings are stored as ``array`` pairs (chunk positions, term
+    frequencies), so the index costs a few bytes per token occurrence and
+    queries never touch chunks that don't contain a query term. Scoring
+    reads the postings as NumPy views and scores a whole term at a time.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids = []         # position -> docstore id
+        self.positions = {}   # docstore id -> position
+        self.documents = []   # position -> Document
+        self.lengths = array("I")
+        self.postings = {}    # term -> (array of positions, array of term frequencies)
+        self.avg_length = 0.0
+        self._norms = np.zeros(0)
+        self._doc_codes = np.zeros(0, dtype=np.int32)
+        self._codes = {}
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore, **kwargs):
+        """Index every chunk stored in a LangChain FAISS vectorstore."""
+        index = cls(**kwargs)
+        if vectorstore is not None:
+            for _, doc_id in sorted(vectorstore.index_to_docstore_id.items()):
+                index.add(doc_id, vectorstore.docstore.search(doc_id))
+        index.finalize()
+        return index
+
+    def add(self, doc_id, document):
+        position = len(self.ids)
+        counts = Counter(tokenize(document.page_content))
+        self.positions[doc_id] = position
+        self.ids.append(doc_id)
+        self.documents.append(document)
+        self.lengths.append(sum(counts.values()))
+        for term, tf in counts.items():
+            entry = self.postings.get(term)
+            if entry is None:
+                entry = self.postings[term] = (array("I"), array("H"))
+            entry[0].append(position)
+            entry[1].append(min(tf, 65535))
+
+    def finalize(self):
+        """Precompute length norms and ``doc_id`` codes; call after the last ``add``."""
+        lengths = np.asarray(self.lengths, dtype=np.float64)
+        self.avg_length = float(lengths.mean()) if len(lengths) else 0.0
+        self._norms = self.k1 * (1 - self.b + self.b * lengths / (self.avg_length or 1.0))
+        self._codes = {}
+        self._doc_codes = np.array(
+            [self._codes.setdefault(doc.metadata.get("doc_id"), len(self._codes)) for doc in self.documents],
+            dtype=np.int32,
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def idf(self, term):
+        df = len(self.postings.get(term, ((),))[0])
+        return math.log(1 + (len(self.ids) - df + 0.5) / (df + 0.5))
+
+    def scores(self, query):
+        """BM25 score of ``query`` for every chunk, as an array indexed by position."""
+        if len(self._norms) != len(self.ids):
+            self.finalize()
+        scores = np.zeros(len(self.ids))
+        k1 = self.k1
+        for term in set(tokenize(query)):
+            entry = self.postings.get(term)
+            if entry is None:
+                continue
+            positions = np.asarray(entry[0])
+            tfs = np.asarray(entry[1], dtype=np.float64)
+            # Positions are unique within a term, so fancy-index += is safe
+            scores[positions] += self.idf(term) * tfs * (k1 + 1) / (tfs + self._norms[positions])
+        return scores
+
+    def top(self, scores, k=4, doc_ids=None):
+        """The ``k`` best chunks for ``scores`` from ``scores()``, as in ``search``."""
+        if doc_ids is not None:
+            codes = [self._codes[d] for d in doc_ids if d in self._codes]
+            scores = np.where(np.isin(self._doc_codes, codes), scores, 0.0)
+        hits = np.flatnonzero(scores > 0)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(self.ids[p], self.documents[p], float(scores[p])) for p in hits]
+
+    def search(self, query, k=4, doc_ids=None):
+        """Return up to ``k`` ``(docstore_id, Document, score)`` tuples, best first.
+
+        ``doc_ids`` restricts results to chunks whose ``doc_id`` metadata is
+        in that collection (see ``CorpusIndex``).
+        """
+        if not self.ids:
+            return []
+        return self.top(self.scores(query), k, doc_ids)
@@ -1,10 +1,25 @@
 from langchain_community.vectorstores import FAISS
 
-def create_vectorstore(chunks, embeddings):
-    return FAISS.from_documents(
+from vectorstore.index_engine import INDEX_MODE, optimize_index
+
+
+def create_vectorstore(chunks, embeddings, index_mode=INDEX_MODE):
+    """Embed ``chunks`` into a FAISS store whose index type suits their count.
+
+    See ``vectorstore.index_engine`` for the available ``index_mode`` values.
+    """
+    vectorstore = FAISS.from_documents(
         documents=chunks,
         embedding=embeddings,
     )
-    return vectorstore
+    return optimize_index(vectorstore, index_mode)
 
 
+def append_embeddings(vectorstore, chunks, vectors, embeddings, ids=None):
+    """Add pre-computed chunk vectors to ``vectorstore``, creating it if None."""
+    text_embeddings = [(chunk.page_content, vector) for chunk, vector in zip(chunks, vectors)]
+    metadatas = [chunk.metadata for chunk in chunks]
+    if vectorstore is None:
+        return FAISS.from_embeddings(text_embeddings, embeddings, metadatas=metadatas, ids=ids)
+    vectorstore.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+    return vectorstore
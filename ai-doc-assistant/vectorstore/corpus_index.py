@@ -0,0 +1,154 @@
+import copy
+
+import faiss
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from retrievers.answerability import AnswerabilityGate, calibrate_threshold
+from vectorstore.bm25_index import BM25Index
+from vectorstore.chroma_store import append_embeddings
+from vectorstore.index_engine import INDEX_MODE, drop_vectors, optimize_index, supports_removal
+
+
+class CorpusIndex:
+    """A single FAISS index over many documents, each added or removed by id.
+
+    Documents are added from their own already-embedded vectorstores (for
+    example entries of ``IndexRegistry``), so adding a document copies its
+    vectors instead of re-embedding anything, and removing one deletes only
+    its chunks. Every chunk gets a ``doc_id`` metadata field that retrieval
+    can filter on. The index type follows ``index_mode`` as the corpus grows
+    (see ``vectorstore.index_engine``).
+    """
+
+    def __init__(self, embeddings, index_mode=INDEX_MODE):
+        self.embeddings = embeddings
+        self.index_mode = index_mode
+        self.vectorstore = None
+        self.documents = {}  # doc_id -> {"name": ..., "chunk_ids": [...], **info}
+        self.version = 0
+        self._bm25 = None
+        self._bm25_version = -1
+        self._gate = None
+        self._gate_version = -1
+
+    def __contains__(self, doc_id):
+        return doc_id in self.documents
+
+    def __len__(self):
+        return len(self.documents)
+
+    @property
+    def doc_ids(self):
+        return list(self.documents)
+
+    def add_document(self, doc_id, vectorstore, name=None, info=None):
+        """Copy the vectors and chunks of ``vectorstore`` into the corpus under ``doc_id``."""
+        if doc_id in self.documents:
+            return
+        count = vectorstore.index.ntotal
+        if count:
+            vectors = vectorstore.index.reconstruct_n(0, count)
+            chunks = []
+            for i in range(count):
+                chunk = vectorstore.docstore.search(vectorstore.index_to_docstore_id[i])
+                chunks.append(Document(
+                    page_content=chunk.page_content,
+                    metadata={**chunk.metadata, "doc_id": doc_id},
+                ))
+            chunk_ids = [f"{doc_id}:{i}" for i in range(count)]
+            self.vectorstore = optimize_index(
+                append_embeddings(self.vectorstore, chunks, vectors.tolist(), self.embeddings, ids=chunk_ids),
+                self.index_mode,
+            )
+        else:
+            chunk_ids = []
+
+        self.documents[doc_id] = {"name": name or doc_id, "chunk_ids": chunk_ids, **(info or {})}
+        self.version += 1
+
+    def remove_document(self, doc_id):
+        """Drop every chunk of ``doc_id`` from the index. Unknown ids are ignored."""
+        entry = self.documents.pop(doc_id, None)
+        if entry is None:
+            return
+        if entry["chunk_ids"]:
+            if supports_removal(self.vectorstore.index):
+                self.vectorstore.delete(entry["chunk_ids"])
+            else:
+                self.vectorstore = drop_vectors(self.vectorstore, entry["chunk_ids"])
+        if not self.documents:
+            self.vectorstore = None
+        self.version += 1
+
+    def copy(self):
+        """Independent copy to change while this corpus is still being searched.
+
+        The index, docstore and document table are copied; chunks and the
+        lazily built BM25 index and gate are shared until the copy changes.
+        """
+        clone = copy.copy(self)
+        clone.documents = {doc_id: dict(entry) for doc_id, entry in self.documents.items()}
+        if self.vectorstore is not None:
+            clone.vectorstore = FAISS(
+                embedding_function=self.vectorstore.embedding_function,
+                index=faiss.clone_index(self.vectorstore.index),
+                docstore=InMemoryDocstore(dict(self.vectorstore.docstore._dict)),
+                index_to_docstore_id=dict(self.vectorstore.index_to_docstore_id),
+            )
+        return clone
+
+    def vectorstore_for(self, embeddings):
+        """The corpus vectorstore, embedding queries with ``embeddings`` instead.
+
+        Shares the index and docstore, so a corpus pooled across sessions can
+        be searched with each session's own client and API key.
+        """
+        if self.vectorstore is None:
+            return None
+        view = copy.copy(self.vectorstore)
+        view.embedding_function = embeddings
+        return view
+
+    def memory_bytes(self):
+        """Rough resident size: index vectors plus chunk text."""
+        if self.vectorstore is None:
+            return 0
+        index = faiss.downcast_index(self.vectorstore.index)
+        code_size = index.sa_code_size() if isinstance(index, faiss.IndexFlatCodes) else index.d * 4
+        text = sum(
+            len(self.vectorstore.docstore.search(docstore_id).page_content)
+            for docstore_id in self.vectorstore.index_to_docstore_id.values()
+        )
+        return index.ntotal * code_size + text
+
+    @property
+    def bm25(self):
+        """BM25 index over the current chunks, rebuilt lazily after adds/removes."""
+        if self._bm25_version != self.version:
+            self._bm25 = BM25Index.from_vectorstore(self.vectorstore)
+            self._bm25_version = self.version
+        return self._bm25
+
+    def answerability(self, embeddings):
+        """``AnswerabilityGate`` calibrated on the current chunks, rebuilt lazily after adds/removes.
+
+        Calibrating embeds a few dozen short queries (see
+        ``calibrate_threshold``) with ``embeddings``, the calling session's
+        own client and key; the threshold only depends on the model, so the
+        gate is then shared by every session on this corpus.
+        """
+        if self._gate_version != self.version:
+            self._gate = AnswerabilityGate(calibrate_threshold(self.vectorstore, embeddings), bm25=self.bm25)
+            self._gate_version = self.version
+        return self._gate
+
+    def totals(self):
+        """Sum of the numeric info fields (pages, chunks, ...) across documents."""
+        totals = {}
+        for entry in self.documents.values():
+            for key, value in entry.items():
+                if isinstance(value, int):
+                    totals[key] = totals.get(key, 0) + value
+        return totals
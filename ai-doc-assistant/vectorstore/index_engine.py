@@ -0,0 +1,266 @@
+import argparse
+import json
+import math
+import os
+import time
+import weakref
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+
+INDEX_MODES = ("auto", "flat", "hnsw", "ivf", "ivfpq")
+
+# "auto" | "flat" | "hnsw" | "ivf" | "ivfpq"
+INDEX_MODE = os.getenv("DOCMIND_INDEX_MODE", "auto")
+# Store full vectors as float16 instead of float32 (halves index memory)
+INDEX_FLOAT16 = os.getenv("DOCMIND_INDEX_FLOAT16", "0") == "1"
+
+# Chunk counts at which "auto" moves to an approximate index. Below
+# IVF_MIN_VECTORS a flat scan is both exact and fast enough.
+IVF_MIN_VECTORS = 20_000
+PQ_MIN_VECTORS = 500_000
+# IVF needs enough vectors to train its coarse quantizer
+MIN_TRAIN_VECTORS = 1_024
+
+HNSW_M = 32
+HNSW_EF_SEARCH = 64
+
+
+def choose_index_mode(count, mode="auto"):
+    """Return the concrete index mode to use for ``count`` vectors."""
+    if mode not in INDEX_MODES:
+        raise ValueError(f"Unknown index mode {mode!r}, expected one of {INDEX_MODES}")
+    if mode == "auto":
+        if count >= PQ_MIN_VECTORS:
+            return "ivfpq"
+        if count >= IVF_MIN_VECTORS:
+            return "ivf"
+        return "flat"
+    if mode in ("ivf", "ivfpq") and count < MIN_TRAIN_VECTORS:
+        return "flat"
+    return mode
+
+
+def index_mode(index):
+    """Return the mode name of an existing FAISS index."""
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+
+def index_float16(index):
+    """Whether an existing FAISS index stores its vectors as float16 (see ``make_index``)."""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        return index.sq.qtype == faiss.ScalarQuantizer.QT_fp16
+    return False
+
+
+def supports_removal(index):
+    """Whether ``index.remove_ids`` compacts positions the way LangChain's FAISS expects."""
+    return isinstance(index, faiss.IndexFlatCodes)
+
+
+def _pq_subquantizers(dim):
+    # ~8 dimensions per 8-bit sub-quantizer: 16x smaller than float32 vectors.
+    # Check recall_report before relying on it; PQ trades recall for memory.
+    m = max(1, dim // 8)
+    while dim % m:
+        m -= 1
+    return m
+
+
+def make_index(dim, count, mode="auto", float16=False):
+    """Create an empty (possibly untrained) FAISS index sized for ``count`` vectors."""
+    mode = choose_index_mode(count, mode)
+    sq_fp16 = faiss.ScalarQuantizer.QT_fp16
+
+    if mode == "hnsw":
+        if float16:
+            index = faiss.IndexHNSWSQ(dim, sq_fp16, HNSW_M)
+        else:
+            index = faiss.IndexHNSWFlat(dim, HNSW_M)
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+        return index
+
+    if mode in ("ivf", "ivfpq"):
+        nlist = max(16, int(4 * math.sqrt(count)))
+        quantizer = faiss.IndexFlatL2(dim)
+        if mode == "ivfpq":
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, _pq_subquantizers(dim), 8)
+        elif float16:
+            index = faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, sq_fp16)
+        else:
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        index.nprobe = max(8, nlist // 16)
+        # Lets stored vectors be read back for corpus merges and re-ranking
+        index.make_direct_map()
+        return index
+
+    if float16:
+        return faiss.IndexScalarQuantizer(dim, sq_fp16)
+    return faiss.IndexFlatL2(dim)
+
+
+def build_index(vectors, mode="auto", float16=False):
+    """Build and fill a FAISS index for ``vectors`` (an ``n x dim`` float array)."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    index = make_index(vectors.shape[1], len(vectors), mode, float16)
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return index
+
+
+def stored_vectors(index):
+    """Read every vector back out of ``index`` (approximate for quantized indexes)."""
+    if index.ntotal == 0:
+        return np.zeros((0, index.d), dtype=np.float32)
+    return index.reconstruct_n(0, index.ntotal)
+
+
+# faiss index -> {docstore id: position}, shared by every view of a vectorstore
+_positions = weakref.WeakKeyDictionary()
+
+
+def vectors_for(vectorstore, docstore_ids):
+    """Stored vectors of the chunks ``docstore_ids``, in that order.
+
+    Reads them back from the index instead of re-embedding the text. Returns
+    None if the index can't reconstruct vectors.
+    """
+    index = vectorstore.index
+    id_map = vectorstore.index_to_docstore_id
+    positions = _positions.get(index)
+    if positions is None or any(id_map.get(positions.get(i)) != i for i in docstore_ids):
+        # Adds and deletes renumber chunks, so rebuild the reverse map when it goes stale
+        positions = {docstore_id: position for position, docstore_id in id_map.items()}
+        _positions[index] = positions
+    try:
+        keys = np.array([positions[i] for i in docstore_ids], dtype=np.int64)
+        return index.reconstruct_batch(keys) if len(keys) else np.zeros((0, index.d), dtype=np.float32)
+    except (KeyError, RuntimeError):
+        return None
+
+
+def reindex(vectorstore, mode="auto", float16=False):
+    """Return a copy of ``vectorstore`` whose index was rebuilt in ``mode``.
+
+    Documents and their positions are unchanged, so retrieval keeps working
+    exactly as before on top of the new index.
+    """
+    index = build_index(stored_vectors(vectorstore.index), mode, float16)
+    return FAISS(
+        embedding_function=vectorstore.embedding_function,
+        index=index,
+        docstore=vectorstore.docstore,
+        index_to_docstore_id=dict(vectorstore.index_to_docstore_id),
+    )
+
+
+def optimize_index(vectorstore, mode=INDEX_MODE, float16=INDEX_FLOAT16):
+    """Rebuild ``vectorstore``'s index if its size calls for a different mode or storage."""
+    target = choose_index_mode(vectorstore.index.ntotal, mode)
+    # IVF-PQ codes are never float16, whatever ``float16`` says
+    same_storage = target == "ivfpq" or index_float16(vectorstore.index) == float16
+    if target == index_mode(vectorstore.index) and same_storage:
+        return vectorstore
+    return reindex(vectorstore, target, float16)
+
+
+def drop_vectors(vectorstore, docstore_ids):
+    """Return ``vectorstore`` without the given chunks, for indexes that can't ``remove_ids``.
+
+    The index keeps its type and training; only the remaining vectors are re-added.
+    """
+    drop = set(docstore_ids)
+    keep = [i for i, doc_id in sorted(vectorstore.index_to_docstore_id.items()) if doc_id not in drop]
+    vectors = stored_vectors(vectorstore.index)[keep]
+
+    index = faiss.clone_index(vectorstore.index)
+    index.reset()
+    if len(vectors):
+        index.add(vectors)
+
+    vectorstore.docstore.delete([doc_id for doc_id in drop if doc_id in vectorstore.docstore._dict])
+    return FAISS(
+        embedding_function=vectorstore.embedding_function,
+        index=index,
+        docstore=vectorstore.docstore,
+        index_to_docstore_id={
+            new: vectorstore.index_to_docstore_id[old] for new, old in enumerate(keep)
+        },
+    )
+
+
+def recall_report(vectors, queries, k=4, configs=None):
+    """Measure recall@k, latency, build time and size for several index settings.
+
+    ``configs`` is a list of ``(mode, float16)`` pairs; recall is measured
+    against an exact flat search over the same vectors.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    configs = configs or [
+        ("flat", False), ("flat", True), ("hnsw", False), ("ivf", False), ("ivf", True), ("ivfpq", False),
+    ]
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, k)
+
+    report = []
+    for mode, float16 in configs:
+        start = time.perf_counter()
+        index = build_index(vectors, mode, float16)
+        build_s = time.perf_counter() - start
+
+        latencies = []
+        hits = 0
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            _, found = index.search(query[None, :], k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += len(set(found[0]) & set(expected))
+
+        report.append({
+            "mode": index_mode(index),
+            "float16": float16,
+            "vectors": len(vectors),
+            f"recall@{k}": round(hits / (len(queries) * k), 4),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+            "build_s": round(build_s, 3),
+            "bytes": len(faiss.serialize_index(index)),
+        })
+    return report
+
+
+def _synthetic_vectors(count, dim, clusters=256, seed=0):
+    # Clustered data behaves much more like real embeddings than uniform noise
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=count)
+    vectors = centers[labels] + 0.3 * rng.normal(size=(count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall vs latency report for FAISS index modes")
+    parser.add_argument("--vectors", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    args = parser.parse_args()
+
+    data = _synthetic_vectors(args.vectors + args.queries, args.dim)
+    results = recall_report(data[args.queries:], data[:args.queries], k=args.k)
+    print(json.dumps(results, indent=2))
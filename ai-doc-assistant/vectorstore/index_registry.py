@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import pickle
+import re
+import shutil
+
+import faiss
+from langchain_community.vectorstores import FAISS
+
+from embeddings.embedding_cache import CACHE_DIR
+
+
+INDEX_DIR = os.path.join(CACHE_DIR, "indexes")
+
+
+def file_hash(file_obj, chunk_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a binary file object or path."""
+    digest = hashlib.sha256()
+    if isinstance(file_obj, (str, os.PathLike)):
+        with open(file_obj, "rb") as f:
+            for block in iter(lambda: f.read(chunk_size), b""):
+                digest.update(block)
+    else:
+        file_obj.seek(0)
+        for block in iter(lambda: file_obj.read(chunk_size), b""):
+            digest.update(block)
+        file_obj.seek(0)
+    return digest.hexdigest()
+
+
+class IndexRegistry:
+    """On-disk FAISS indexes keyed by document hash and embedding model.
+
+    Each entry is a directory holding the FAISS index, the pickled docstore
+    and a small ``info.json`` (page/chunk counts). Entries are read from
+    disk on every ``get`` and not kept: callers such as ``CorpusIndex`` copy
+    what they need, and only the pooled corpora stay in memory, within
+    ``POOL_MAX_BYTES``. With ``mmap=True`` the index file is memory-mapped
+    read-only, so loaded indexes must not be mutated; copy the vectors into
+    a new index if you need to add to them.
+    """
+
+    def __init__(self, root=INDEX_DIR, mmap=True):
+        self.root = root
+        self.mmap = mmap
+
+    def _path(self, doc_hash, model_id):
+        model_dir = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_id)
+        return os.path.join(self.root, model_dir, doc_hash)
+
+    def exists(self, doc_hash, model_id):
+        return os.path.exists(os.path.join(self._path(doc_hash, model_id), "info.json"))
+
+    def info(self, doc_hash, model_id):
+        """Return the stored info dict for an entry without loading its index."""
+        with open(os.path.join(self._path(doc_hash, model_id), "info.json")) as f:
+            return json.load(f)
+
+    def get(self, doc_hash, model_id, embeddings):
+        """Load the entry from disk as a FAISS vectorstore that queries through ``embeddings``."""
+        path = self._path(doc_hash, model_id)
+        flags = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY if self.mmap else 0
+        index = faiss.read_index(os.path.join(path, "index.faiss"), flags)
+        with open(os.path.join(path, "index.pkl"), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        return FAISS(
+            embedding_function=embeddings,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=index_to_docstore_id,
+        )
+
+    def save(self, doc_hash, model_id, vectorstore, info):
+        """Persist ``vectorstore`` and its ``info`` dict under the given key."""
+        path = self._path(doc_hash, model_id)
+        tmp_path = path + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        vectorstore.save_local(tmp_path)
+        with open(os.path.join(tmp_path, "info.json"), "w") as f:
+            json.dump(info, f)
+        # Swap the finished directory in so readers never see a partial entry
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+
+    def get_or_create(self, doc_hash, model_id, embeddings, build):
+        """Return ``(vectorstore, info)``, calling ``build()`` only on a cache miss.
+
+        ``build`` must return a ``(vectorstore, info)`` tuple; the result is
+        saved before being returned.
+        """
+        if not self.exists(doc_hash, model_id):
+            vectorstore, info = build()
+            self.save(doc_hash, model_id, vectorstore, info)
+        return self.get(doc_hash, model_id, embeddings), self.info(doc_hash, model_id)
+
+    def remove(self, doc_hash, model_id):
+        shutil.rmtree(self._path(doc_hash, model_id), ignore_errors=True)
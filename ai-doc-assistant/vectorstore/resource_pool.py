@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+
+# Memory that idle pooled resources may keep before the least recently used are evicted
+POOL_MAX_BYTES = int(os.getenv("DOCMIND_POOL_MAX_MB", "2048")) * 1024 * 1024
+
+
+def _sizeof(value):
+    memory_bytes = getattr(value, "memory_bytes", None)
+    return memory_bytes() if callable(memory_bytes) else 0
+
+
+class _Entry:
+    def __init__(self, value, size):
+        self.value = value
+        self.size = size
+        self.refs = 0
+        self.last_used = time.time()
+
+
+class Lease:
+    """A reference to a pooled resource; ``release`` (or garbage collection) gives it back."""
+
+    def __init__(self, pool, key, value):
+        self.key = key
+        self.value = value
+        # Sessions that end without releasing still free their reference
+        self._finalizer = weakref.finalize(self, pool._release, key)
+
+    @property
+    def released(self):
+        return not self._finalizer.alive
+
+    def release(self):
+        self._finalizer()
+
+
+class ResourcePool:
+    """Process-wide, reference-counted resources shared by all sessions.
+
+    ``acquire(key, build)`` returns a ``Lease`` on the resource for ``key``,
+    building it once no matter how many sessions ask at the same time.
+    Resources nobody holds a lease on stay pooled for the next session
+    until the pool is over ``max_bytes``; then the least recently used idle
+    ones are evicted. Leased resources are never evicted, so the ceiling
+    can be exceeded while they are all in use. Pooled values are shared
+    and must be treated as read-only.
+    """
+
+    def __init__(self, max_bytes=POOL_MAX_BYTES, sizeof=_sizeof):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries = OrderedDict()
+        self._building = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def acquire(self, key, build):
+        """Lease the resource for ``key``, calling ``build()`` if it isn't pooled."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                build_lock = self._building.setdefault(key, threading.Lock())
+        if entry is None:
+            # One builder per key; the others wait and then share its result
+            with build_lock:
+                with self._lock:
+                    entry = self._entries.get(key)
+                if entry is None:
+                    value = build()
+                    entry = _Entry(value, self.sizeof(value))
+                    with self._lock:
+                        self._entries[key] = entry
+                        self._building.pop(key, None)
+        with self._lock:
+            # Re-pool it if it was evicted while idle between the two locks
+            entry = self._entries.setdefault(key, entry)
+            entry.refs += 1
+            entry.last_used = time.time()
+            self._entries.move_to_end(key)
+            self._evict()
+        return Lease(self, key, entry.value)
+
+    def _release(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.refs = max(0, entry.refs - 1)
+                entry.last_used = time.time()
+            self._evict()
+
+    def _evict(self):
+        total = sum(entry.size for entry in self._entries.values())
+        for key in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            entry = self._entries[key]
+            if entry.refs == 0:
+                del self._entries[key]
+                total -= entry.size
+
+    def stats(self):
+        """Pooled resources, leases held and estimated bytes."""
+        with self._lock:
+            entries = list(self._entries.values())
+        return {
+            "resources": len(entries),
+            "leases": sum(entry.refs for entry in entries),
+            "idle": sum(1 for entry in entries if entry.refs == 0),
+            "bytes": sum(entry.size for entry in entries),
+        }